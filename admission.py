@@ -0,0 +1,101 @@
+import threading
+from contextlib import contextmanager
+
+class Overloaded(Exception):
+    """Raised when an endpoint cannot take on more work; carries the HTTP status and Retry-After to send."""
+
+    def __init__(self, message: str, status: int, retry_after: int):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Merges concurrent calls that share a key so the work runs once and every caller gets its result.
+
+    Only in-flight calls are merged; nothing is cached once the call finishes.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """
+        Run fn for the given key, or wait for the identical call already running.
+
+        Args:
+            key: Hashable key identifying the normalized request
+            fn (callable): The work to run if no identical call is in flight
+
+        Returns:
+            The result of fn; exceptions raised by fn are re-raised in every caller
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+class AdmissionLimiter:
+    """
+    Caps how many requests an endpoint works on at once, with a bounded queue for the rest.
+
+    A request that finds the queue full is rejected straight away with a 429. One that waits in
+    the queue longer than queue_timeout is rejected with a 503. Neither waits for a client timeout.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float, retry_after: int):
+        self.name = name
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._waiting = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def admit(self):
+        with self._lock:
+            acquired = self._slots.acquire(blocking=False)
+            if not acquired:
+                if self._waiting >= self.max_queue:
+                    raise Overloaded(f"Too many {self.name} requests, please retry shortly", 429, self.retry_after)
+                self._waiting += 1
+
+        if not acquired:
+            try:
+                acquired = self._slots.acquire(timeout=self.queue_timeout)
+            finally:
+                with self._lock:
+                    self._waiting -= 1
+            if not acquired:
+                raise Overloaded(f"The {self.name} service is busy, please retry shortly", 503, self.retry_after)
+
+        try:
+            yield
+        finally:
+            self._slots.release()
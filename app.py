@@ -1,14 +1,28 @@
-from flask import Flask, render_template, jsonify, request, session, redirect, url_for, flash, send_file
+from flask import Flask, render_template, jsonify, request, session, redirect, url_for, flash, send_file, make_response, Response, stream_with_context
 import json
 import os
+import hashlib
 import httpx
 import io
+from contextlib import ExitStack
 from functools import wraps
-from config import SECRET_KEY, ADMIN_PASSWORD
+from config import (
+    SECRET_KEY, ADMIN_PASSWORD, PAGE_CACHE_MAX_ENTRIES, PAGE_CACHE_PROXY_MAX_AGE,
+    TTS_MAX_CONCURRENT, TTS_MAX_QUEUE, GENERATE_MAX_CONCURRENT, GENERATE_MAX_QUEUE,
+    ADMISSION_QUEUE_TIMEOUT, ADMISSION_RETRY_AFTER, KB_AUDIO_VOICES, KB_AUDIO_FORMAT, GENERATE_BATCH_MAX_NODES,
+    OPENAI_API_BASE
+)
 from prompts import get_autism_chat_assistant_prompt, get_content_generation_prompt, get_field_specific_prompt
-from kokoro import KPipeline
+from profiling import init_profiling, phase, list_profiles, load_profile, profile_stats_path, PHASES
+from page_cache import PageCache
+from kb_snapshot import SnapshotManager, write_atomic
+from kb_layout import LayoutCache
+from assets import AssetManifest, send_asset, IMMUTABLE_MAX_AGE
+from admission import SingleFlight, AdmissionLimiter, Overloaded
+from batch_generation import plan_batch, generate_batch
+from tts import synthesize, SAMPLE_RATE
+from generate_audio import find_kb_audio, field_text, text_hash, KB_AUDIO_FIELDS, AUDIO_FORMATS
 import soundfile as sf
-import torch
 
 # Voice configuration
 VOICES = {
@@ -42,11 +56,55 @@ VOICES = {
     'bm_lewis': {'name': 'Lewis', 'accent': 'British', 'gender': 'M'},
 }
 
-# Initialize TTS pipeline globally
-tts_pipeline = KPipeline(lang_code='a')
+KNOWLEDGE_BASE_FILE = 'knowledge_base.json'
+KNOWLEDGE_SNAPSHOT_FILE = 'knowledge_base.snapshot'
+
+# Compiled, memory-mapped knowledge base shared by all workers
+kb_snapshots = SnapshotManager(KNOWLEDGE_BASE_FILE, KNOWLEDGE_SNAPSHOT_FILE)
+
+# Rendered knowledge pages, invalidated per topic when the knowledge base changes
+page_cache = PageCache(max_entries=PAGE_CACHE_MAX_ENTRIES)
+
+# Network view layout, recomputed once per knowledge base version
+graph_layouts = LayoutCache()
+
+# Duplicate in-flight requests are merged, and each expensive endpoint gets a bounded work queue
+tts_flight = SingleFlight()
+generate_flight = SingleFlight()
+tts_limiter = AdmissionLimiter('TTS', TTS_MAX_CONCURRENT, TTS_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT, ADMISSION_RETRY_AFTER)
+generate_limiter = AdmissionLimiter('generation', GENERATE_MAX_CONCURRENT, GENERATE_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT, ADMISSION_RETRY_AFTER)
 
 app = Flask(__name__)
 app.secret_key = SECRET_KEY
+init_profiling(app)
+
+# Hashed, precompressed copies of static/ written by build_assets.py
+asset_manifest = AssetManifest(app.static_folder)
+
+@app.template_global()
+def asset_url(path, external=False):
+    """URL of a static file, pointing at its fingerprinted build when there is one."""
+    entry = asset_manifest.get(path)
+    if entry is None:
+        return url_for('static', filename=path, _external=external)
+    return url_for('built_asset', filename=entry['file'], _external=external)
+
+@app.template_global()
+def kb_audio_url(topic, field, voice=None):
+    """
+    URL of a field's pre-rendered audio, versioned by the text it was rendered from.
+
+    Editing the text changes the URL (and drops the cached topic page), so browsers and proxies
+    can keep the audio for as long as they like without ever playing it for old text.
+    """
+    voice = voice or KB_AUDIO_VOICES[0]
+    digest = text_hash(field_text(topic, field), voice)
+    params = {'voice': voice} if voice != KB_AUDIO_VOICES[0] else {}
+    return url_for('kb_audio', topic_id=topic['id'], field=field, v=digest, **params)
+
+@app.route('/static/dist/<path:filename>')
+def built_asset(filename):
+    return send_asset(app.static_folder, filename)
 
 def login_required(f):
     @wraps(f)
@@ -57,16 +115,45 @@ def login_required(f):
     return decorated_function
 
 def load_knowledge_base():
-    with open('knowledge_base.json', 'r') as f:
+    with open(KNOWLEDGE_BASE_FILE, 'r') as f:
         return json.load(f)
 
-def find_relevant_entries(message, knowledge_base):
+def save_knowledge_base(data):
+    # Write to a temporary file first so readers never see a half-written knowledge base
+    write_atomic(KNOWLEDGE_BASE_FILE, json.dumps(data, indent=2).encode('utf-8'))
+
+def overloaded_response(error):
+    response = jsonify({"error": str(error)})
+    response.status_code = error.status
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+def current_snapshot():
+    snapshot = kb_snapshots.current()
+    page_cache.refresh(snapshot.version, snapshot.index, snapshot.source_mtime_ns / 1e9)
+    return snapshot
+
+def cached_page_response(page):
+    response = make_response(page.html)
+    response.set_etag(page.etag)
+    if page.last_modified:
+        response.last_modified = page.last_modified
+    if session.get('logged_in'):
+        response.headers['Cache-Control'] = 'private, no-cache'
+    else:
+        # Browsers revalidate every time (cheap 304s); nginx may serve it for a short while
+        response.headers['Cache-Control'] = f'public, max-age=0, s-maxage={PAGE_CACHE_PROXY_MAX_AGE}'
+    return response.make_conditional(request)
+
+def find_relevant_entries(message, snapshot):
     # Extract keywords from message and find matching entries
     keywords = [word for word in message.lower().split() 
                if len(word) > 3 and word not in ['what', 'when', 'where', 'why', 'how', 'can', 'will', 'should']]
     
-    return [entry for entry in knowledge_base 
-            if any(keyword in entry['title'].lower() for keyword in keywords)][:3]
+    # Match on titles straight from the snapshot index and only decode the hits
+    matches = [i for i, title in enumerate(snapshot.titles())
+               if any(keyword in title.lower() for keyword in keywords)][:3]
+    return [snapshot.node(i) for i in matches]
 
 def prepare_context(entries):
     context = []
@@ -97,7 +184,13 @@ def chat():
 
 @app.route('/knowledge')
 def knowledge():
-    return render_template('knowledge.html')
+    cache_key = ('knowledge', bool(session.get('logged_in')), asset_manifest.version)
+    if session.get('_flashes'):
+        return render_template('knowledge.html')
+    page = page_cache.get(cache_key)
+    if page is None:
+        page = page_cache.put(cache_key, render_template('knowledge.html'), [])
+    return cached_page_response(page)
 
 @app.route('/todo')
 def todo():
@@ -124,20 +217,65 @@ def logout():
 def get_knowledge():
     try:
         if request.method == 'GET':
-            kb_data = load_knowledge_base()
-            return jsonify(kb_data)
+            with phase('kb_load'):
+                version = current_snapshot().version
+                if request.if_none_match.contains(version):
+                    return '', 304
+                kb_data = load_knowledge_base()
+            with phase('serialization'):
+                response = jsonify(kb_data)
+            response.set_etag(version)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
         elif request.method in ['POST', 'PUT']:
             # Only allow logged in users to modify the knowledge base
             if not session.get('logged_in'):
                 return jsonify({"error": "Unauthorized"}), 401
             
             data = request.json
-            with open('knowledge_base.json', 'w') as f:
-                json.dump(data, f, indent=2)
+            save_knowledge_base(data)
+            # Publish the new snapshot and drop cached pages for the edited topics now;
+            # other workers pick both up on their next request
+            kb_snapshots.rebuild()
+            current_snapshot()
             return jsonify({"message": "Knowledge base updated successfully"})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/knowledge/graph')
+def knowledge_graph():
+    """Node positions and edges for the network view; the layout is computed on the server."""
+    try:
+        with phase('kb_load'):
+            snapshot = current_snapshot()
+            if request.if_none_match.contains(snapshot.version):
+                return '', 304
+        with phase('serialization'):
+            response = make_response(graph_layouts.get(snapshot))
+        response.mimetype = 'application/json'
+        response.set_etag(snapshot.version)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/knowledge/<topic_id>')
+def get_topic(topic_id):
+    """A single topic, for the details the network view shows on hover and click."""
+    try:
+        with phase('kb_load'):
+            snapshot = current_snapshot()
+        with phase('retrieval'):
+            topic = snapshot.get(topic_id)
+        if topic is None:
+            return jsonify({"error": "Topic not found"}), 404
+        response = jsonify(topic)
+        response.set_etag(snapshot.version)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/chat', methods=['POST'])
 def chat_endpoint():
     try:
@@ -149,14 +287,17 @@ def chat_endpoint():
             return jsonify({"error": "Missing message or API key"}), 400
 
         # Find relevant knowledge base entries
-        kb_data = load_knowledge_base()
-        relevant_entries = find_relevant_entries(message, kb_data)
-        context = prepare_context(relevant_entries)
+        with phase('kb_load'):
+            snapshot = current_snapshot()
+        with phase('retrieval'):
+            relevant_entries = find_relevant_entries(message, snapshot)
+        with phase('context_build'):
+            context = prepare_context(relevant_entries)
 
         # Prepare the chat completion request
-        with httpx.Client() as client:
+        with phase('upstream'), httpx.Client() as client:
             response = client.post(
-                'https://api.openai.com/v1/chat/completions',
+                f'{OPENAI_API_BASE}/chat/completions',
                 headers={
                     'Authorization': f'Bearer {api_key}',
                     'Content-Type': 'application/json'
@@ -174,9 +315,10 @@ def chat_endpoint():
                 timeout=30.0
             )
             
-            if response.status_code != 200:
-                return jsonify({"error": "Failed to get response from OpenAI"}), 500
-                
+        if response.status_code != 200:
+            return jsonify({"error": "Failed to get response from OpenAI"}), 500
+            
+        with phase('serialization'):
             response_data = response.json()
             return jsonify(response_data)
 
@@ -187,8 +329,7 @@ def chat_endpoint():
 @login_required
 def edit_knowledge_item(topic_id):
     try:
-        kb_data = load_knowledge_base()
-        topic = next((t for t in kb_data if t['id'] == topic_id), None)
+        topic = current_snapshot().get(topic_id)
         if not topic:
             flash('Topic not found')
             return redirect(url_for('knowledge'))
@@ -210,64 +351,145 @@ def generate_content():
         if not field or not api_key:
             return jsonify({"error": "Missing required fields"}), 400
 
-        # Get current value of the field
-        current_value = context.get(field, "") if isinstance(context, dict) else ""
-        if isinstance(current_value, list):
-            current_value = "\n".join([f"- {item}" for item in current_value])
+        # Identical requests (double clicks, several tabs) share one completion; the API key is
+        # part of the key so requests are never billed to someone else's key
+        key = hashlib.sha256(json.dumps(
+            [field, context, user_instructions, api_key], sort_keys=True
+        ).encode('utf-8')).hexdigest()
 
-        # Generate the enhanced prompt with current value, context, and user instructions
-        prompt = get_field_specific_prompt(field, current_value, context, user_instructions)
+        def run():
+            with generate_limiter.admit():
+                return generate_field_content(field, context, api_key, user_instructions)
 
-        # Call OpenAI API
-        with httpx.Client() as client:
-            response = client.post(
-                'https://api.openai.com/v1/chat/completions',
-                headers={
-                    'Authorization': f'Bearer {api_key}',
-                    'Content-Type': 'application/json'
-                },
-                json={
-                    'model': 'gpt-4o-mini',
-                    'messages': [
-                        {'role': 'system', 'content': get_content_generation_prompt()},
-                        {'role': 'user', 'content': prompt}
-                    ]
-                },
-                timeout=30.0
-            )
-            
-            if response.status_code != 200:
-                return jsonify({"error": "Failed to get response from OpenAI"}), 500
-                
-            response_data = response.json()
-            generated_content = response_data['choices'][0]['message']['content']
-
-            # For list fields, split the content into an array
-            if field in ['challenges', 'strategies', 'examples', 'action_steps']:
-                # Split on newlines and clean up any bullet points or numbers
-                content_array = [line.strip().lstrip('•-*1234567890. ') 
-                               for line in generated_content.split('\n')
-                               if line.strip() and not line.strip().startswith('#')]
-                return jsonify({
-                    "current": context.get(field, []),
-                    "generated": content_array,
-                    "is_list": True
-                })
-            else:
-                return jsonify({
-                    "current": context.get(field, ""),
-                    "generated": generated_content.strip(),
-                    "is_list": False
-                })
+        payload, status = generate_flight.do(key, run)
+        return jsonify(payload), status
 
+    except Overloaded as e:
+        return overloaded_response(e)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/generate/batch', methods=['POST'])
+@login_required
+def generate_batch_content():
+    """
+    Generates several fields for one or more topics with a single completion.
+
+    Expects {"nodes": [{"id", "fields", "context"?}], "api_key", "user_instructions"?}. A topic
+    without a context is generated from its saved version. The response is newline-delimited
+    JSON with one event per field, sent as soon as each field is complete.
+    """
+    try:
+        data = request.json
+        nodes = data.get('nodes')
+        api_key = data.get('api_key')
+        user_instructions = data.get('user_instructions', '')
+
+        if not nodes or not api_key:
+            return jsonify({"error": "Missing required fields"}), 400
+
+        if isinstance(nodes, list) and any(isinstance(node, dict) and 'context' not in node for node in nodes):
+            with phase('kb_load'):
+                snapshot = current_snapshot()
+            for node in nodes:
+                if isinstance(node, dict) and 'context' not in node:
+                    node['context'] = snapshot.get(node.get('id'))
+                    if node['context'] is None:
+                        return jsonify({"error": f"Topic {node.get('id')} not found"}), 404
+
+        try:
+            plan = plan_batch(nodes, GENERATE_BATCH_MAX_NODES)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # Streamed responses cannot be shared between callers, so batches are not coalesced.
+        # The generation slot is taken before streaming starts, so an overloaded worker can
+        # still answer 429/503, and is held until the response is closed.
+        admission = ExitStack()
+        admission.enter_context(generate_limiter.admit())
+
+        def events():
+            for event in generate_batch(plan, api_key, user_instructions):
+                yield json.dumps(event) + '\n'
+
+        response = Response(stream_with_context(events()), mimetype='application/x-ndjson')
+        response.headers['Cache-Control'] = 'no-store'
+        # Stop nginx from buffering the stream, which would hold back every field until the end
+        response.headers['X-Accel-Buffering'] = 'no'
+        response.call_on_close(admission.close)
+        return response
+
+    except Overloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def generate_field_content(field, context, api_key, user_instructions):
+    # Get current value of the field
+    current_value = context.get(field, "") if isinstance(context, dict) else ""
+    if isinstance(current_value, list):
+        current_value = "\n".join([f"- {item}" for item in current_value])
+
+    # Generate the enhanced prompt with current value, context, and user instructions
+    prompt = get_field_specific_prompt(field, current_value, context, user_instructions)
+
+    # Call OpenAI API
+    with phase('upstream'), httpx.Client() as client:
+        response = client.post(
+            f'{OPENAI_API_BASE}/chat/completions',
+            headers={
+                'Authorization': f'Bearer {api_key}',
+                'Content-Type': 'application/json'
+            },
+            json={
+                'model': 'gpt-4o-mini',
+                'messages': [
+                    {'role': 'system', 'content': get_content_generation_prompt()},
+                    {'role': 'user', 'content': prompt}
+                ]
+            },
+            timeout=30.0
+        )
+        
+    if response.status_code != 200:
+        return {"error": "Failed to get response from OpenAI"}, 500
+        
+    response_data = response.json()
+    generated_content = response_data['choices'][0]['message']['content']
+
+    # For list fields, split the content into an array
+    if field in ['challenges', 'strategies', 'examples', 'action_steps']:
+        # Split on newlines and clean up any bullet points or numbers
+        content_array = [line.strip().lstrip('•-*1234567890. ') 
+                       for line in generated_content.split('\n')
+                       if line.strip() and not line.strip().startswith('#')]
+        return {
+            "current": context.get(field, []),
+            "generated": content_array,
+            "is_list": True
+        }, 200
+    else:
+        return {
+            "current": context.get(field, ""),
+            "generated": generated_content.strip(),
+            "is_list": False
+        }, 200
+
 @app.route('/topic/<topic_id>')
 def view_topic(topic_id):
     try:
-        kb_data = load_knowledge_base()
-        topic = next((t for t in kb_data if t['id'] == topic_id), None)
+        with phase('kb_load'):
+            snapshot = current_snapshot()
+
+        # Pages carrying flash messages are one-off and never cached
+        cacheable = not session.get('_flashes')
+        cache_key = ('topic', topic_id, bool(session.get('logged_in')), asset_manifest.version)
+        page = page_cache.get(cache_key) if cacheable else None
+        if page is not None:
+            return cached_page_response(page)
+
+        with phase('retrieval'):
+            topic = snapshot.get(topic_id)
         if not topic:
             flash('Topic not found')
             return redirect(url_for('knowledge'))
@@ -276,18 +498,25 @@ def view_topic(topic_id):
         if 'metadata' not in topic:
             topic['metadata'] = {}
             
-        # Get parent topic if it exists
-        parent = next((t for t in kb_data if t['id'] == topic.get('parent_id')), None)
-        
-        # Get child topics
-        children = [t for t in kb_data if t.get('parent_id') == topic_id]
-        
-        # Ensure each child has metadata
-        for child in children:
-            if 'metadata' not in child:
-                child['metadata'] = {}
+        with phase('context_build'):
+            # Get parent topic if it exists
+            parent = snapshot.get(topic.get('parent_id'))
+            
+            # Get child topics
+            children = snapshot.children(topic_id)
+            
+            # Ensure each child has metadata
+            for child in children:
+                if 'metadata' not in child:
+                    child['metadata'] = {}
         
-        return render_template('topic.html', topic=topic, parent=parent, children=children)
+        with phase('serialization'):
+            html = render_template('topic.html', topic=topic, parent=parent, children=children)
+        if not cacheable:
+            return html
+
+        depends_on = [topic_id, topic.get('parent_id')] + [child['id'] for child in children]
+        return cached_page_response(page_cache.put(cache_key, html, depends_on, snapshot.version, topic_id))
     except Exception as e:
         flash('Error loading topic')
         return redirect(url_for('knowledge'))
@@ -312,30 +541,111 @@ def generate_tts():
         if voice not in VOICES:
             return jsonify({"error": "Invalid voice"}), 400
 
-        # Generate audio using Kokoro
-        audio_data = None
-        for _, _, audio in tts_pipeline(text, voice=voice):
-            audio_data = audio
-            break  # We only need the first generation
-            
-        if audio_data is None:
+        # Requests that differ only in whitespace produce the same audio
+        key = (voice, ' '.join(text.split()))
+
+        def run():
+            with tts_limiter.admit():
+                return synthesize_wav(text, voice)
+
+        wav_bytes = tts_flight.do(key, run)
+        if wav_bytes is None:
             return jsonify({"error": "Failed to generate audio"}), 500
-            
-        # Convert numpy array to WAV bytes
-        wav_buffer = io.BytesIO()
-        sf.write(wav_buffer, audio_data, 24000, format='WAV')
-        wav_buffer.seek(0)
         
         # Return WAV file
         return send_file(
-            wav_buffer,
+            io.BytesIO(wav_bytes),
             mimetype='audio/wav',
             as_attachment=True,
             download_name='tts.wav'
         )
 
+    except Overloaded as e:
+        return overloaded_response(e)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def synthesize_wav(text, voice):
+    # Generate audio using Kokoro, sentence by sentence across the synthesis pool
+    with phase('upstream'):
+        audio_data = synthesize(text, voice)
+        
+    if audio_data is None:
+        return None
+        
+    # Convert numpy array to WAV bytes
+    with phase('serialization'):
+        wav_buffer = io.BytesIO()
+        sf.write(wav_buffer, audio_data, SAMPLE_RATE, format='WAV')
+    return wav_buffer.getvalue()
+
+def audio_not_found(message):
+    # Audio may be rendered at any time, so a miss must not be cached
+    response = jsonify({"error": message})
+    response.status_code = 404
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@app.route('/api/kb-audio/<topic_id>/<field>', methods=['GET'])
+def kb_audio(topic_id, field):
+    voice = request.args.get('voice', KB_AUDIO_VOICES[0])
+    if field not in KB_AUDIO_FIELDS or voice not in VOICES:
+        return jsonify({"error": "Invalid field or voice"}), 400
+
+    topic = current_snapshot().get(topic_id)
+    if not topic:
+        return audio_not_found("Topic not found")
+
+    # Only audio rendered from the current text is found, so edits never play stale audio
+    audio = find_kb_audio(topic, field, voice)
+    if not audio:
+        return audio_not_found("Audio not generated yet")
+
+    path, digest = audio
+    version = request.args.get('v')
+    if version is not None and version != digest:
+        # The page asking for it was rendered from text that has since been edited
+        return audio_not_found("Audio is for text that has since changed")
+
+    response = send_file(
+        os.path.abspath(path),
+        mimetype=AUDIO_FORMATS[KB_AUDIO_FORMAT]['mimetype'],
+        etag=digest,
+        conditional=True
+    )
+    if version is not None:
+        # A versioned URL always refers to the same audio
+        response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        # The unversioned URL follows the current text; the ETag keeps revalidation cheap
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@app.route('/admin/profiles')
+@login_required
+def admin_profiles():
+    return render_template('profiles.html', profiles=list_profiles(), phases=PHASES)
+
+@app.route('/admin/profiles/<profile_id>')
+@login_required
+def admin_profile_detail(profile_id):
+    profile = load_profile(profile_id)
+    if not profile:
+        flash('Profile not found')
+        return redirect(url_for('admin_profiles'))
+    return render_template('profile_detail.html', profile=profile, phases=PHASES,
+                           has_dump=profile_stats_path(profile_id) is not None)
+
+@app.route('/admin/profiles/<profile_id>/download')
+@login_required
+def admin_profile_download(profile_id):
+    path = profile_stats_path(profile_id)
+    if not path:
+        flash('Profile dump not found')
+        return redirect(url_for('admin_profiles'))
+    return send_file(path, mimetype='application/octet-stream', as_attachment=True,
+                     download_name=f'{profile_id}.prof')
+
 if __name__ == '__main__':
     app.run(debug=True, port=5001) 
\ No newline at end of file
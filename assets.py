@@ -0,0 +1,93 @@
+"""
+Fingerprinted static assets.
+
+build_assets.py writes minified copies of the files in static/ to static/dist/ under names that
+include a hash of their content, with gzip and brotli variants and a manifest mapping each source
+path to its hashed name. asset_url() resolves a source path through the manifest and falls back
+to the plain static file when no build has been run, so development needs no build step.
+"""
+import json
+import mimetypes
+import os
+import threading
+from flask import request, send_from_directory
+from werkzeug.security import safe_join
+
+ASSET_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# A hashed file never changes, so browsers and proxies may keep it for a year without revalidating
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Precompressed variants, in order of preference
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+class AssetManifest:
+    """
+    The manifest written by build_assets.py.
+
+    It is re-read whenever the file changes, so a build on a running server is picked up by
+    every worker without a restart.
+    """
+
+    def __init__(self, static_folder: str):
+        self.path = os.path.join(static_folder, ASSET_DIR, MANIFEST_NAME)
+        self._mtime = None
+        self._assets = {}
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        """
+        Identifies the current build (None without one).
+
+        Cached pages embed hashed asset URLs, so this belongs in their cache keys: pages rendered
+        against an older build may point at files a later build has pruned.
+        """
+        self._reload_if_changed()
+        return self._mtime
+
+    def get(self, path: str):
+        """Returns the manifest entry for a source path (relative to static/), or None."""
+        self._reload_if_changed()
+        return self._assets.get(path)
+
+    def _reload_if_changed(self) -> None:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self._assets = self._load() if mtime is not None else {}
+                    self._mtime = mtime
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('assets', {})
+        except (OSError, ValueError):
+            return {}
+
+def send_asset(static_folder: str, filename: str):
+    """
+    Serves a built asset, preferring a precompressed variant the client accepts.
+
+    Responses are marked immutable, since a changed file always gets a new name.
+    """
+    directory = os.path.join(static_folder, ASSET_DIR)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    for encoding, suffix in ENCODINGS:
+        variant = safe_join(directory, filename + suffix)
+        if request.accept_encodings[encoding] and variant and os.path.isfile(variant):
+            response = send_from_directory(directory, filename + suffix, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(directory, filename, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return response
@@ -0,0 +1,288 @@
+"""
+Batch content generation for the knowledge editor.
+
+Any set of fields for one or more topics is generated by a single structured completion, so the
+system prompt, field instructions and topic context are sent once instead of once per field. The
+completion is streamed and each field is handed back as soon as its value is complete.
+"""
+import json
+import httpx
+from config import OPENAI_API_BASE
+from prompts import FIELD_PROMPTS, get_content_generation_prompt, get_batch_generation_prompt
+
+OPENAI_CHAT_URL = f'{OPENAI_API_BASE}/chat/completions'
+MODEL = 'gpt-4o-mini'
+
+LIST_FIELDS = ['challenges', 'strategies', 'examples', 'action_steps']
+
+# Number of list items to ask for when a field is empty (see get_content_generation_prompt)
+EMPTY_LIST_ITEMS = (3, 4)
+
+# Fields that come back missing or with too few items are asked for once more
+MAX_RETRIES = 1
+
+def current_value(context: dict, field: str):
+    """Returns a field's current value, preferring an edited top-level value over the stored metadata."""
+    if field in context:
+        return context[field]
+    return (context.get('metadata') or {}).get(field)
+
+def list_items(current) -> tuple:
+    """Returns the (min, max) number of items a list field must have: as many as now, or 3-4 if empty."""
+    if isinstance(current, str):
+        current = [line for line in current.split('\n') if line.strip()]
+    count = len(current) if isinstance(current, list) else 0
+    return (count, count) if count else EMPTY_LIST_ITEMS
+
+def plan_batch(nodes: list, max_nodes: int) -> list:
+    """
+    Validates a batch request and works out what to ask for.
+
+    Args:
+        nodes (list): One dict per topic with 'id', 'context' (the topic data) and 'fields'
+        max_nodes (int): Largest number of topics allowed in one batch
+
+    Returns:
+        list: One dict per topic with 'key' (its key in the completion), 'id', 'context' and
+            'fields' (field name -> (min, max) list items, or None for text fields)
+
+    Raises:
+        ValueError: If the request is malformed
+    """
+    if not isinstance(nodes, list) or not nodes:
+        raise ValueError("No topics to generate")
+    if len(nodes) > max_nodes:
+        raise ValueError(f"At most {max_nodes} topics can be generated at once")
+
+    plan = []
+    seen = set()
+    for i, node in enumerate(nodes):
+        if not isinstance(node, dict):
+            raise ValueError("Each topic needs an id, a context and a list of fields")
+        node_id = node.get('id')
+        context = node.get('context')
+        fields = node.get('fields')
+        if not node_id or not isinstance(context, dict) or not isinstance(fields, list) or not fields:
+            raise ValueError("Each topic needs an id, a context and a list of fields")
+        if node_id in seen:
+            raise ValueError(f"Topic {node_id} appears more than once")
+        seen.add(node_id)
+
+        unknown = [field for field in fields if field not in FIELD_PROMPTS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(map(str, unknown))}")
+
+        plan.append({
+            'key': f"t{i}",
+            'id': node_id,
+            'context': context,
+            'fields': {
+                field: list_items(current_value(context, field)) if field in LIST_FIELDS else None
+                for field in dict.fromkeys(fields)
+            }
+        })
+    return plan
+
+def response_format(plan: list) -> dict:
+    """Builds a strict JSON schema with one object per topic and one property per requested field."""
+    def field_schema(items):
+        if items is None:
+            return {'type': 'string'}
+        return {'type': 'array', 'items': {'type': 'string'}, 'minItems': items[0], 'maxItems': items[1]}
+
+    def object_schema(properties):
+        return {
+            'type': 'object',
+            'properties': properties,
+            'required': list(properties),
+            'additionalProperties': False
+        }
+
+    schema = object_schema({
+        node['key']: object_schema({field: field_schema(items) for field, items in node['fields'].items()})
+        for node in plan
+    })
+    return {'type': 'json_schema', 'json_schema': {'name': 'batch_content', 'schema': schema, 'strict': True}}
+
+def clean_value(value, items):
+    """
+    Checks a generated value against its field's rules.
+
+    Lists with too many items are cut to the maximum, since the first items are as good as any.
+
+    Returns:
+        The cleaned value, or None if it is unusable (empty, wrong type or too few items)
+    """
+    if items is None:
+        return (value.strip() or None) if isinstance(value, str) else None
+    if not isinstance(value, list):
+        return None
+    value = [item.strip() for item in value if isinstance(item, str) and item.strip()]
+    if len(value) < items[0]:
+        return None
+    return value[:items[1]]
+
+class FieldStream:
+    """
+    Incremental scanner for the streamed completion.
+
+    Fed the JSON text as it arrives, it returns every (topic key, field, value) whose value has
+    been closed, without waiting for the rest of the document.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self._pos = 0
+        self._stack = []
+        self._keys = {}
+        self._expect_key = False
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._value_start = None
+
+    def feed(self, text: str) -> list:
+        self.buffer += text
+        buffer = self.buffer
+        completed = []
+
+        for i in range(self._pos, len(buffer)):
+            c = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == '\\':
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._expect_key and self._stack[-1] == '{':
+                        self._keys[len(self._stack)] = json.loads(buffer[self._string_start:i + 1])
+                    elif self._value_start is not None and len(self._stack) == 2:
+                        completed.append(self._complete(i))
+                continue
+
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+                if len(self._stack) == 2 and not self._expect_key:
+                    self._value_start = i
+            elif c in '{[':
+                if len(self._stack) == 2 and not self._expect_key:
+                    self._value_start = i
+                self._stack.append(c)
+                self._expect_key = c == '{'
+            elif c in '}]':
+                self._stack.pop()
+                self._expect_key = False
+                if self._value_start is not None and len(self._stack) == 2:
+                    completed.append(self._complete(i))
+            elif c == ':':
+                self._expect_key = False
+            elif c == ',':
+                self._expect_key = self._stack[-1] == '{'
+
+        self._pos = len(buffer)
+        return completed
+
+    def _complete(self, end: int) -> tuple:
+        value = json.loads(self.buffer[self._value_start:end + 1])
+        self._value_start = None
+        return self._keys.get(1), self._keys.get(2), value
+
+def stream_completion(client: httpx.Client, api_key: str, plan: list, user_instructions: str, usage: dict):
+    """
+    Runs one streamed completion for the plan and yields (topic key, field, value) as each field closes.
+
+    Token usage reported by the API is added to usage.
+
+    Raises:
+        httpx.HTTPError: If the request fails or the API does not answer with 200
+    """
+    prompt = get_batch_generation_prompt(plan, user_instructions)
+    with client.stream(
+        'POST',
+        OPENAI_CHAT_URL,
+        headers={
+            'Authorization': f'Bearer {api_key}',
+            'Content-Type': 'application/json'
+        },
+        json={
+            'model': MODEL,
+            'messages': [
+                {'role': 'system', 'content': get_content_generation_prompt()},
+                {'role': 'user', 'content': prompt}
+            ],
+            'response_format': response_format(plan),
+            'stream': True,
+            'stream_options': {'include_usage': True}
+        },
+        timeout=60.0
+    ) as response:
+        response.raise_for_status()
+        fields = FieldStream()
+        for line in response.iter_lines():
+            if not line.startswith('data: '):
+                continue
+            data = line[len('data: '):]
+            if data == '[DONE]':
+                break
+            chunk = json.loads(data)
+            for key, value in (chunk.get('usage') or {}).items():
+                if isinstance(value, int):
+                    usage[key] = usage.get(key, 0) + value
+            for choice in chunk.get('choices') or []:
+                content = (choice.get('delta') or {}).get('content')
+                if content:
+                    yield from fields.feed(content)
+
+def generate_batch(plan: list, api_key: str, user_instructions: str = ''):
+    """
+    Generates every field in the plan and yields one event per field as soon as it is ready.
+
+    Events have the same shape as /api/generate responses plus 'node_id' and 'field'. A field
+    that still fails its rules after the retries gets an event with 'error' instead. The last
+    event is {'done': True, 'usage': ...}.
+    """
+    nodes = {node['key']: node for node in plan}
+    pending = plan
+    usage = {}
+
+    with httpx.Client() as client:
+        for attempt in range(MAX_RETRIES + 1):
+            done = set()
+            try:
+                for key, field, value in stream_completion(client, api_key, pending, user_instructions, usage):
+                    node = nodes.get(key)
+                    if node is None or field not in node['fields'] or (key, field) in done:
+                        continue
+                    value = clean_value(value, node['fields'][field])
+                    if value is None:
+                        continue
+                    done.add((key, field))
+                    yield {
+                        'node_id': node['id'],
+                        'field': field,
+                        'current': current_value(node['context'], field),
+                        'generated': value,
+                        'is_list': field in LIST_FIELDS
+                    }
+            except (httpx.HTTPError, ValueError):
+                if not done and attempt == 0:
+                    yield {'error': 'Failed to get response from OpenAI'}
+                    return
+
+            # Ask again only for what is still missing
+            pending = [
+                dict(node, fields={field: items for field, items in node['fields'].items()
+                                   if (node['key'], field) not in done})
+                for node in pending
+            ]
+            pending = [node for node in pending if node['fields']]
+            if not pending:
+                break
+
+    for node in pending:
+        for field in node['fields']:
+            yield {'node_id': node['id'], 'field': field, 'error': 'Could not generate valid content'}
+
+    yield {'done': True, 'usage': usage}
@@ -0,0 +1,89 @@
+"""
+Compares two load_test.py result files, for example from before and after a change:
+
+    python benchmarks/compare.py results/base.json results/head.json --threshold 10
+
+Exits with status 1 when any latency percentile or peak worker memory grew, or throughput fell,
+by more than the threshold.
+"""
+import argparse
+import json
+import sys
+
+# (label, path into a profile's results, True when higher is better)
+METRICS = [
+    ('req/s', ('ok_throughput_rps',), True),
+    ('p50 ms', ('latency_ms', 'p50'), False),
+    ('p95 ms', ('latency_ms', 'p95'), False),
+    ('p99 ms', ('latency_ms', 'p99'), False),
+    ('rss MB', ('memory', 'max_rss_mb'), False),
+    ('anon MB', ('memory', 'max_anon_mb'), False),
+]
+
+def lookup(result: dict, path: tuple):
+    for key in path:
+        if not isinstance(result, dict):
+            return None
+        result = result.get(key)
+    return result
+
+def load_results(path: str) -> dict:
+    """Returns the results keyed by (nodes, profile), with the run's metadata."""
+    with open(path, 'r') as f:
+        data = json.load(f)
+    results = {
+        (entry['nodes'], name): profile
+        for entry in data['results']
+        for name, profile in entry['profiles'].items()
+    }
+    return data, results
+
+def change(base, head):
+    if base is None or head is None or base == 0:
+        return None
+    return 100 * (head - base) / base
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two load test result files.")
+    parser.add_argument('base', help="Results of the reference run")
+    parser.add_argument('head', help="Results of the run to check")
+    parser.add_argument('--threshold', type=float, default=10, help="Percent change counted as a regression")
+    args = parser.parse_args()
+
+    base_data, base = load_results(args.base)
+    head_data, head = load_results(args.head)
+    print(f"base: {base_data.get('commit') or args.base}")
+    print(f"head: {head_data.get('commit') or args.head}")
+    if base_data.get('config') != head_data.get('config') or base_data.get('machine') != head_data.get('machine'):
+        print("Warning: the runs used different settings or machines, so differences may not be meaningful")
+
+    regressions = []
+    print(f"\n{'nodes':>6} {'profile':<16} " + ' '.join(f"{label:>18}" for label, _, _ in METRICS))
+    for key in sorted(base.keys() & head.keys()):
+        cells = []
+        for label, path, higher_is_better in METRICS:
+            before, after = lookup(base[key], path), lookup(head[key], path)
+            delta = change(before, after)
+            if delta is None:
+                cells.append(f"{'-':>18}")
+                continue
+            worse = -delta if higher_is_better else delta
+            flag = '!' if worse > args.threshold else ' '
+            if flag == '!':
+                regressions.append((key, label, before, after, delta))
+            cells.append(f"{after:>9.1f} {delta:>+6.1f}%{flag}")
+        print(f"{key[0]:>6} {key[1]:<16} " + ' '.join(cells))
+
+    missing = sorted(base.keys() ^ head.keys())
+    if missing:
+        print(f"\nOnly in one run: {', '.join(f'{profile} ({nodes} nodes)' for nodes, profile in missing)}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:g}%:")
+        for (nodes, profile), label, before, after, delta in regressions:
+            print(f"  {profile} ({nodes} nodes) {label}: {before} -> {after} ({delta:+.1f}%)")
+        sys.exit(1)
+    print(f"\nNo regressions beyond {args.threshold:g}%")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+"""
+Load tests for the hot endpoints, run against a real gunicorn server with the OpenAI API replaced
+by benchmarks/mock_openai.py.
+
+For each knowledge base size a synthetic knowledge base is generated, gunicorn is started on it
+and every profile is run in turn: a fixed number of client threads send requests back to back for
+a fixed time. Latency percentiles, throughput, status codes and the memory of each gunicorn worker
+are reported, and --output saves everything as JSON for benchmarks/compare.py.
+
+    python benchmarks/load_test.py --sizes 100 1000 10000 --output results/$(git rev-parse --short HEAD).json
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_kb import DEFAULT_SIZES, write_knowledge_base
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ADMIN_PASSWORD = 'load-test'
+API_KEY = 'sk-load-test'
+
+CHAT_MESSAGES = [
+    "How do I handle feedback in one-to-one meetings?",
+    "The open-plan office is too loud, what can I do about sensory overload?",
+    "Should I disclose my diagnosis during interviews?",
+    "I struggle with small talk at team lunch",
+    "How can I plan around urgent deadlines without burning out?",
+]
+
+DEFAULT_PROFILES = ['knowledge_api', 'knowledge_graph', 'topic_json', 'topic_page', 'knowledge_page',
+                    'chat', 'generate', 'generate_batch']
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of already sorted values."""
+    if not values:
+        return None
+    rank = max(0, min(len(values) - 1, math.ceil(pct / 100 * len(values)) - 1))
+    return values[rank]
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def read_memory(pid: int) -> dict:
+    """Resident memory of a process in MB: all of it, and the part not shared with other processes."""
+    memory = {}
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                name, _, value = line.partition(':')
+                if name in ('VmRSS', 'RssAnon'):
+                    memory['rss_mb' if name == 'VmRSS' else 'anon_mb'] = int(value.split()[0]) / 1024
+    except OSError:
+        pass
+    return memory
+
+def worker_pids(master_pid: int) -> list:
+    try:
+        with open(f'/proc/{master_pid}/task/{master_pid}/children') as f:
+            return [int(pid) for pid in f.read().split()]
+    except OSError:
+        return []
+
+class MemorySampler:
+    """Records the peak memory of each gunicorn worker while a profile runs."""
+
+    def __init__(self, master_pid: int, interval: float = 0.25):
+        self.master_pid = master_pid
+        self.interval = interval
+        self.peaks = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        for pid in worker_pids(self.master_pid):
+            peak = self.peaks.setdefault(pid, {})
+            for key, value in read_memory(pid).items():
+                peak[key] = max(peak.get(key, 0), value)
+
+    def summary(self) -> dict:
+        workers = [
+            {'pid': pid, **{key: round(value, 1) for key, value in peak.items()}}
+            for pid, peak in sorted(self.peaks.items())
+        ]
+        return {
+            'workers': workers,
+            'max_rss_mb': max((w.get('rss_mb', 0) for w in workers), default=None),
+            'max_anon_mb': max((w.get('anon_mb', 0) for w in workers), default=None)
+        }
+
+def start_mock(port: int, args) -> subprocess.Popen:
+    """
+    Runs benchmarks/mock_openai.py in its own process, so its threads do not compete with the
+    client threads for the interpreter lock and add latency the real API would not.
+    """
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(REPO_DIR, 'benchmarks', 'mock_openai.py'), '--port', str(port),
+         '--latency-ms', str(args.latency_ms), '--jitter-ms', str(args.jitter_ms), '--chunk-ms', str(args.chunk_ms),
+         '--rate-limit', str(args.rate_limit), '--seed', str(args.seed)],
+        stdout=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline and process.poll() is None:
+        try:
+            httpx.get(f'http://127.0.0.1:{port}/stats', timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Mock OpenAI API did not start")
+
+class Server:
+    """A gunicorn server running the app on a synthetic knowledge base in a scratch directory."""
+
+    def __init__(self, workdir: str, openai_base: str, workers: int, threads: int, warm_tts: bool = False):
+        self.workdir = workdir
+        self.port = free_port()
+        self.url = f'http://127.0.0.1:{self.port}'
+        env = dict(os.environ, OPENAI_API_BASE=openai_base, ADMIN_PASSWORD=ADMIN_PASSWORD,
+                   SECRET_KEY='load-test-secret', WEB_CONCURRENCY=str(workers))
+        self.log = open(os.path.join(self.workdir, 'gunicorn.log'), 'wb')
+        # gunicorn only finds gunicorn.conf.py in its working directory; its hook loads the TTS
+        # model, which is only worth the time and memory when TTS is being tested
+        config = ['--config', os.path.join(REPO_DIR, 'gunicorn.conf.py')] if warm_tts else []
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--threads', str(threads),
+             '--bind', f'127.0.0.1:{self.port}', '--pythonpath', REPO_DIR, *config, 'app:app'],
+            cwd=self.workdir, env=env, stdout=self.log, stderr=subprocess.STDOUT
+        )
+
+    def wait_ready(self, timeout: float = 60) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"gunicorn exited:\n{self.output()}")
+            try:
+                httpx.get(f'{self.url}/login', timeout=1)
+                return
+            except httpx.HTTPError:
+                time.sleep(0.2)
+        raise RuntimeError(f"gunicorn did not start within {timeout}s:\n{self.output()}")
+
+    def output(self) -> str:
+        self.log.flush()
+        with open(self.log.name, 'rb') as f:
+            return f.read()[-4000:].decode('utf-8', 'replace')
+
+    def login(self) -> httpx.Cookies:
+        response = httpx.post(f'{self.url}/login', data={'password': ADMIN_PASSWORD})
+        if not response.cookies:
+            raise RuntimeError("Login failed")
+        return response.cookies
+
+    def stop(self) -> None:
+        self.process.send_signal(signal.SIGTERM)
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.log.close()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+def build_profiles(knowledge_base: list) -> dict:
+    """
+    The request each profile sends, as functions taking a random generator and returning
+    (method, path, JSON body or None).
+    """
+    ids = [node['id'] for node in knowledge_base]
+    by_id = {node['id']: node for node in knowledge_base}
+
+    def context(node_id):
+        node = by_id[node_id]
+        return {'title': node['title'], 'category': node['category'], 'metadata': node['metadata']}
+
+    def batch(rng):
+        nodes = [{'id': node_id, 'fields': ['challenges', 'strategies']}
+                 for node_id in rng.sample(ids, min(3, len(ids)))]
+        return 'POST', '/api/generate/batch', {'nodes': nodes, 'api_key': API_KEY}
+
+    return {
+        'knowledge_api': lambda rng: ('GET', '/api/knowledge', None),
+        'knowledge_graph': lambda rng: ('GET', '/api/knowledge/graph', None),
+        'topic_json': lambda rng: ('GET', f'/api/knowledge/{rng.choice(ids)}', None),
+        'topic_page': lambda rng: ('GET', f'/topic/{rng.choice(ids)}', None),
+        'knowledge_page': lambda rng: ('GET', '/knowledge', None),
+        'chat': lambda rng: ('POST', '/api/chat', {'message': rng.choice(CHAT_MESSAGES), 'api_key': API_KEY}),
+        'generate': lambda rng: ('POST', '/api/generate', {
+            'field': 'strategies', 'context': context(rng.choice(ids)), 'api_key': API_KEY
+        }),
+        'generate_batch': batch,
+        'tts': lambda rng: ('POST', '/api/tts', {'text': rng.choice(CHAT_MESSAGES), 'voice': 'af_heart'}),
+    }
+
+def run_profile(server: Server, cookies: httpx.Cookies, request_for, concurrency: int, duration: float,
+                warmup: int, seed: int) -> dict:
+    """
+    Sends requests from `concurrency` threads, each starting its next request as soon as the last
+    one finishes, for `duration` seconds.
+
+    Each request is read to the end, so streamed responses are timed to their last byte; the time
+    to the first byte is recorded separately.
+    """
+    results = []
+    lock = threading.Lock()
+
+    def send(client, rng):
+        method, path, body = request_for(rng)
+        start = time.perf_counter()
+        first_byte = None
+        try:
+            with client.stream(method, path, json=body) as response:
+                for _ in response.iter_raw():
+                    if first_byte is None:
+                        first_byte = time.perf_counter() - start
+                status = response.status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - start
+        return status, elapsed, first_byte if first_byte is not None else elapsed
+
+    with httpx.Client(base_url=server.url, cookies=cookies, timeout=120) as client:
+        rng = random.Random(seed)
+        for _ in range(warmup):
+            send(client, rng)
+
+    start_barrier = threading.Barrier(concurrency + 1)
+    deadline = [0.0]
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        with httpx.Client(base_url=server.url, cookies=cookies, timeout=120,
+                          limits=httpx.Limits(max_connections=1)) as client:
+            start_barrier.wait()
+            local = []
+            while time.perf_counter() < deadline[0]:
+                local.append(send(client, rng))
+        with lock:
+            results.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+
+    with MemorySampler(server.process.pid) as memory:
+        started = time.perf_counter()
+        deadline[0] = started + duration
+        start_barrier.wait()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+
+    statuses = {}
+    for status, _, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    latencies = sorted(elapsed * 1000 for _, elapsed, _ in results)
+    first_bytes = sorted(first * 1000 for _, _, first in results)
+    ok = sum(1 for status, _, _ in results if isinstance(status, int) and status < 400)
+
+    def rounded(value):
+        return round(value, 2) if value is not None else None
+
+    return {
+        'requests': len(results),
+        'ok': ok,
+        'statuses': statuses,
+        'throughput_rps': round(len(results) / wall, 2),
+        'ok_throughput_rps': round(ok / wall, 2),
+        'latency_ms': {
+            'p50': rounded(percentile(latencies, 50)),
+            'p95': rounded(percentile(latencies, 95)),
+            'p99': rounded(percentile(latencies, 99)),
+            'mean': rounded(sum(latencies) / len(latencies)) if latencies else None,
+            'max': rounded(latencies[-1]) if latencies else None
+        },
+        'first_byte_ms': {
+            'p50': rounded(percentile(first_bytes, 50)),
+            'p95': rounded(percentile(first_bytes, 95)),
+            'p99': rounded(percentile(first_bytes, 99))
+        },
+        'memory': memory.summary()
+    }
+
+def print_table(size: int, profiles: dict) -> None:
+    print(f"\nKnowledge base: {size} nodes")
+    print(f"{'profile':<16} {'req/s':>8} {'ok %':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'ttfb p50':>9} {'rss MB':>8} {'anon MB':>8}")
+    for name, result in profiles.items():
+        latency = result['latency_ms']
+        ok_pct = 100 * result['ok'] / result['requests'] if result['requests'] else 0
+
+        def fmt(value):
+            return f"{value:.1f}" if value is not None else '-'
+
+        print(f"{name:<16} {result['throughput_rps']:>8.1f} {ok_pct:>6.1f} {fmt(latency['p50']):>9} "
+              f"{fmt(latency['p95']):>9} {fmt(latency['p99']):>9} {fmt(result['first_byte_ms']['p50']):>9} "
+              f"{fmt(result['memory']['max_rss_mb']):>8} {fmt(result['memory']['max_anon_mb']):>8}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the hot endpoints against a mock OpenAI API.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="Synthetic knowledge base sizes (nodes)")
+    parser.add_argument('--profiles', nargs='+', default=DEFAULT_PROFILES,
+                        help=f"Profiles to run (default: {' '.join(DEFAULT_PROFILES)}; 'tts' needs the Kokoro model)")
+    parser.add_argument('--concurrency', type=int, default=16, help="Client threads per profile")
+    parser.add_argument('--duration', type=float, default=10, help="Seconds per profile")
+    parser.add_argument('--warmup', type=int, default=5, help="Requests sent before timing each profile")
+    parser.add_argument('--workers', type=int, default=4, help="gunicorn workers")
+    parser.add_argument('--threads', type=int, default=4, help="gunicorn threads per worker")
+    parser.add_argument('--latency-ms', type=float, default=500, help="Mock OpenAI latency before the first byte")
+    parser.add_argument('--jitter-ms', type=float, default=100, help="Mock OpenAI latency variation")
+    parser.add_argument('--chunk-ms', type=float, default=20, help="Mock OpenAI delay between streamed chunks")
+    parser.add_argument('--rate-limit', type=float, default=0.0, help="Share of mock OpenAI requests answered with 429")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    mock_port = free_port()
+    mock = start_mock(mock_port, args)
+    openai_base = f'http://127.0.0.1:{mock_port}/v1'
+    print(f"Mock OpenAI API on {openai_base}; {args.workers} workers x {args.threads} threads, "
+          f"{args.concurrency} clients, {args.duration:g}s per profile")
+
+    results = []
+    try:
+        for size in args.sizes:
+            # The app reads knowledge_base.json (and writes its snapshot) in its working directory
+            workdir = tempfile.mkdtemp(prefix='corpotism-load-')
+            knowledge_base = write_knowledge_base(os.path.join(workdir, 'knowledge_base.json'), size, args.seed)
+            profiles_for = build_profiles(knowledge_base)
+
+            server = Server(workdir, openai_base, args.workers, args.threads, warm_tts='tts' in args.profiles)
+            try:
+                server.wait_ready()
+                cookies = server.login()
+                profiles = {}
+                for name in args.profiles:
+                    profiles[name] = run_profile(server, cookies, profiles_for[name], args.concurrency,
+                                                 args.duration, args.warmup, args.seed)
+                    print(f"  {name}: {profiles[name]['requests']} requests")
+            finally:
+                server.stop()
+
+            print_table(size, profiles)
+            results.append({'nodes': size, 'profiles': profiles})
+    finally:
+        mock.terminate()
+        mock.wait()
+
+    if args.output:
+        output = {
+            'commit': git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'machine': {'cpus': os.cpu_count(), 'platform': platform.platform(), 'python': platform.python_version()},
+            'config': {key: value for key, value in vars(args).items() if key != 'output'},
+            'results': results
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(output, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+if __name__ == "__main__":
+    main()
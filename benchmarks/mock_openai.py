@@ -0,0 +1,220 @@
+"""
+Local stand-in for the OpenAI chat completions API, for load tests that must not depend on
+(or pay for) the real service.
+
+Every completion waits a configurable time before answering, optionally streams its content in
+chunks, and a configurable share of requests is rejected with 429. Requests with a json_schema
+response_format get a document that satisfies the schema, so structured-output code paths parse
+the answer exactly as they would a real one.
+
+    python benchmarks/mock_openai.py --port 8900 --latency-ms 800 --rate-limit 0.05
+    OPENAI_API_BASE=http://127.0.0.1:8900/v1 gunicorn app:app
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY_TEXT = (
+    "Open-plan offices can be hard work. Noise-cancelling headphones, a quiet room for focused "
+    "tasks and a short break after long meetings all help. It is worth asking your manager what "
+    "flexibility the team already has before making a formal request."
+)
+
+def schema_instance(schema: dict, words: list):
+    """Builds a value that satisfies a (strict-mode) JSON schema."""
+    kind = schema.get('type')
+    if kind == 'object':
+        return {name: schema_instance(sub, words) for name, sub in schema.get('properties', {}).items()}
+    if kind == 'array':
+        count = schema.get('minItems', schema.get('maxItems', 3))
+        return [schema_instance(schema.get('items', {'type': 'string'}), words) for _ in range(count)]
+    if kind == 'integer':
+        return random.randint(0, 10)
+    if kind == 'number':
+        return random.random()
+    if kind == 'boolean':
+        return random.random() < 0.5
+    return ' '.join(random.sample(words, min(len(words), 12))).capitalize() + '.'
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+class MockState:
+    """Settings and counters shared by every request the server handles."""
+
+    def __init__(self, latency_ms: float = 500, jitter_ms: float = 0, chunk_ms: float = 20,
+                 chunk_chars: int = 16, rate_limit: float = 0.0, retry_after: int = 1, seed: int = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.chunk_ms = chunk_ms
+        self.chunk_chars = chunk_chars
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.counts = {'requests': 0, 'streamed': 0, 'rate_limited': 0}
+        self.lock = threading.Lock()
+
+    def count(self, key: str) -> None:
+        with self.lock:
+            self.counts[key] += 1
+
+    def latency(self) -> float:
+        with self.lock:
+            jitter = self.random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0
+            return max(0.0, self.latency_ms + jitter) / 1000
+
+    def rate_limited(self) -> bool:
+        with self.lock:
+            return self.rate_limit > 0 and self.random.random() < self.rate_limit
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/stats':
+            self._send_json(200, dict(self.state.counts))
+        else:
+            self._send_json(404, {'error': {'message': 'Not found'}})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return self._send_json(400, {'error': {'message': 'Invalid JSON'}})
+
+        if self.path.rstrip('/') != '/v1/chat/completions':
+            return self._send_json(404, {'error': {'message': 'Not found'}})
+
+        state = self.state
+        state.count('requests')
+        if state.rate_limited():
+            state.count('rate_limited')
+            return self._send_json(429, {'error': {'message': 'Rate limit reached', 'type': 'requests'}},
+                                   {'Retry-After': str(state.retry_after)})
+
+        content = self._content(body)
+        prompt_tokens = sum(estimate_tokens(str(m.get('content', ''))) for m in body.get('messages', []))
+        usage = {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': estimate_tokens(content),
+            'total_tokens': prompt_tokens + estimate_tokens(content)
+        }
+
+        time.sleep(state.latency())
+        if body.get('stream'):
+            state.count('streamed')
+            self._stream(body, content, usage)
+        else:
+            self._send_json(200, {
+                'id': 'chatcmpl-mock',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': body.get('model', 'mock'),
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': content},
+                    'finish_reason': 'stop'
+                }],
+                'usage': usage
+            })
+
+    def _content(self, body: dict) -> str:
+        response_format = body.get('response_format') or {}
+        if response_format.get('type') == 'json_schema':
+            schema = response_format.get('json_schema', {}).get('schema', {})
+            return json.dumps(schema_instance(schema, REPLY_TEXT.lower().replace('.', '').replace(',', '').split()))
+        if response_format.get('type') == 'json_object':
+            return json.dumps({'content': REPLY_TEXT})
+        return REPLY_TEXT
+
+    def _stream(self, body: dict, content: str, usage: dict) -> None:
+        state = self.state
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+
+        def event(payload):
+            self.wfile.write(f"data: {payload}\n\n".encode('utf-8'))
+            self.wfile.flush()
+
+        base = {'id': 'chatcmpl-mock', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                'model': body.get('model', 'mock')}
+        try:
+            for i in range(0, len(content), state.chunk_chars):
+                event(json.dumps(dict(base, choices=[{
+                    'index': 0, 'delta': {'content': content[i:i + state.chunk_chars]}, 'finish_reason': None
+                }])))
+                if state.chunk_ms:
+                    time.sleep(state.chunk_ms / 1000)
+            event(json.dumps(dict(base, choices=[{'index': 0, 'delta': {}, 'finish_reason': 'stop'}])))
+            if (body.get('stream_options') or {}).get('include_usage'):
+                event(json.dumps(dict(base, choices=[], usage=usage)))
+            event('[DONE]')
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        self.close_connection = True
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None) -> None:
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+def start_mock_server(host: str = '127.0.0.1', port: int = 0, **settings):
+    """
+    Starts the mock API on a background thread.
+
+    Args:
+        host (str): Interface to listen on
+        port (int): Port to listen on; 0 picks a free one
+        **settings: MockState settings (latency_ms, jitter_ms, chunk_ms, chunk_chars, rate_limit, ...)
+
+    Returns:
+        tuple: (server, base URL to use as OPENAI_API_BASE); call server.shutdown() to stop it
+    """
+    handler = type('Handler', (MockOpenAIHandler,), {'state': MockState(**settings)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a mock OpenAI chat completions API.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency-ms', type=float, default=500, help="Time before the first byte of each completion")
+    parser.add_argument('--jitter-ms', type=float, default=0, help="Random +/- variation of the latency")
+    parser.add_argument('--chunk-ms', type=float, default=20, help="Delay between streamed chunks")
+    parser.add_argument('--chunk-chars', type=int, default=16, help="Characters per streamed chunk")
+    parser.add_argument('--rate-limit', type=float, default=0.0, help="Share of requests answered with 429 (0-1)")
+    parser.add_argument('--retry-after', type=int, default=1, help="Retry-After sent with 429s (seconds)")
+    parser.add_argument('--seed', type=int, help="Seed for jitter and 429 injection")
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(
+        args.host, args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, chunk_ms=args.chunk_ms,
+        chunk_chars=args.chunk_chars, rate_limit=args.rate_limit, retry_after=args.retry_after, seed=args.seed
+    )
+    print(f"Mock OpenAI API listening on {base_url} (GET /stats for request counts)")
+    print("Press Ctrl+C to stop the server")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
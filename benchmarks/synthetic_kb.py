@@ -0,0 +1,108 @@
+import argparse
+import json
+import os
+import random
+import uuid
+
+DEFAULT_SIZES = [100, 1000, 10000]
+
+# Roughly one top-level topic per this many nodes, as in the real knowledge base
+NODES_PER_TOPIC = 6
+
+SUBJECTS = [
+    'communication', 'meetings', 'feedback', 'sensory', 'workspace', 'interviews', 'deadlines',
+    'email', 'teamwork', 'management', 'networking', 'presentations', 'accommodations', 'routine',
+    'disclosure', 'conflict', 'onboarding', 'performance', 'remote', 'travel', 'mentoring', 'boundaries',
+    'planning', 'promotion', 'burnout', 'focus', 'documentation', 'negotiation', 'lunch', 'smalltalk'
+]
+QUALIFIERS = [
+    'verbal', 'written', 'informal', 'structured', 'unexpected', 'hybrid', 'cross-team', 'one-to-one',
+    'quarterly', 'open-plan', 'asynchronous', 'client-facing', 'social', 'technical', 'urgent', 'ongoing'
+]
+WORDS = (
+    'clear expectations help autistic professionals plan their work and reduce uncertainty around '
+    'changing priorities while written follow-ups after meetings give everyone a shared record of '
+    'decisions and quiet spaces allow recovery from sensory load during busy periods of the week'
+).split()
+
+def sentence(rng: random.Random, length: int = 14) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(length)).capitalize() + '.'
+
+def items(rng: random.Random) -> list:
+    return [sentence(rng, rng.randint(10, 18)) for _ in range(rng.randint(3, 4))]
+
+def render_body(node: dict) -> str:
+    """Builds the plain-text body stored alongside the metadata, in the same layout as real nodes."""
+    metadata = node['metadata']
+    if node['category'] == 'TOPIC':
+        parts = [f"Importance:\n{metadata['importance']}"]
+    else:
+        parts = [f"Relation to Parent Topic:\n{metadata['relation_to_parent']}"]
+    for label, field in [('Key Challenges', 'challenges'), ('Strategies', 'strategies'),
+                         ('Examples', 'examples'), ('Action Steps', 'action_steps')]:
+        parts.append(f"{label}:\n" + '\n'.join(f"- {item}" for item in metadata[field]))
+    return '\n\n'.join(parts)
+
+def generate_knowledge_base(nodes: int, seed: int = 0) -> list:
+    """
+    Generates a knowledge base with the same shape as the real one.
+
+    Top-level topics each get a tree of subtopics; most subtopics hang directly off a topic and
+    the rest nest under other subtopics, a few levels deep. The same size and seed always give
+    the same knowledge base.
+    """
+    rng = random.Random(seed)
+    topics = max(1, nodes // NODES_PER_TOPIC)
+    knowledge_base = []
+    for i in range(nodes):
+        is_topic = i < topics
+        if is_topic:
+            parent_id = None
+        elif rng.random() < 0.6 or i == topics:
+            parent_id = knowledge_base[rng.randrange(topics)]['id']
+        else:
+            parent_id = knowledge_base[rng.randrange(topics, i)]['id']
+
+        metadata = {
+            'challenges': items(rng),
+            'strategies': items(rng),
+            'examples': items(rng),
+            'action_steps': items(rng)
+        }
+        if is_topic:
+            metadata['importance'] = sentence(rng, 24)
+        else:
+            metadata['relation_to_parent'] = sentence(rng, 24)
+
+        node = {
+            'id': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            'title': f"{rng.choice(QUALIFIERS).capitalize()} {rng.choice(SUBJECTS)} {i}",
+            'category': 'TOPIC' if is_topic else 'SUBTOPIC',
+            'parent_id': parent_id,
+            'metadata': metadata
+        }
+        node['body'] = render_body(node)
+        knowledge_base.append(node)
+    return knowledge_base
+
+def write_knowledge_base(path: str, nodes: int, seed: int = 0) -> list:
+    knowledge_base = generate_knowledge_base(nodes, seed)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(knowledge_base, f, indent=2)
+    return knowledge_base
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic knowledge bases for benchmarking.")
+    parser.add_argument('--nodes', type=int, nargs='+', default=DEFAULT_SIZES, help="Knowledge base sizes to generate")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output-dir', default='benchmarks/data', help="Writes knowledge_base_<nodes>.json here")
+    args = parser.parse_args()
+
+    for nodes in args.nodes:
+        path = os.path.join(args.output_dir, f"knowledge_base_{nodes}.json")
+        write_knowledge_base(path, nodes, args.seed)
+        print(f"Wrote {nodes} nodes to {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+if __name__ == "__main__":
+    main()
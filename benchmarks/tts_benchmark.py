@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts import SAMPLE_RATE, create_executor, synthesize, synthesize_segment
+
+SAMPLE_TEXT = """It's completely normal to find open-plan offices exhausting. The constant background noise, \
+movement in your peripheral vision and unpredictable interruptions all compete for attention. \
+Many autistic professionals find that noise-cancelling headphones help, especially during focused work. \
+You could also ask your manager about booking a quiet room for tasks that need deep concentration. \
+If you're worried about how that request will be received, frame it around productivity: \
+"I do my best work on complex problems when I can minimise interruptions." \
+That keeps the focus on outcomes rather than on needing an accommodation. \
+It also helps to plan recovery time after busy meetings, like a short walk or a few minutes somewhere quiet. \
+Finally, remember that what works is personal, so experiment and keep what actually helps you."""
+
+def default_core_counts() -> list:
+    cpus = os.cpu_count() or 1
+    counts = []
+    n = 1
+    while n < cpus:
+        counts.append(n)
+        n *= 2
+    counts.append(cpus)
+    return counts
+
+def benchmark(processes: int, threads: int, text: str, voice: str, runs: int) -> dict:
+    """Times synthesis of the text with a pool of the given size and reports the real-time factor."""
+    executor = create_executor(processes, threads)
+    try:
+        # Start every process and load its pipeline so that is not counted
+        list(executor.map(synthesize_segment, ["Warming up."] * processes, [voice] * processes))
+
+        timings = []
+        audio_seconds = 0.0
+        for _ in range(runs):
+            start = time.perf_counter()
+            audio = synthesize(text, voice, executor=executor, processes=processes)
+            timings.append(time.perf_counter() - start)
+            audio_seconds = len(audio) / SAMPLE_RATE
+    finally:
+        executor.shutdown()
+
+    wall = min(timings)
+    return {
+        'processes': processes,
+        'threads_per_process': threads,
+        'cores_used': processes * threads,
+        'audio_seconds': round(audio_seconds, 2),
+        'wall_seconds': round(wall, 3),
+        'real_time_factor': round(wall / audio_seconds, 4) if audio_seconds else None
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure TTS real-time factor against the number of synthesis processes.")
+    parser.add_argument('--processes', type=int, nargs='+', default=default_core_counts(),
+                        help="Pool sizes to try (default: powers of two up to the core count)")
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2],
+                        help="torch threads per process to try")
+    parser.add_argument('--voice', default='af_heart')
+    parser.add_argument('--runs', type=int, default=3, help="Timed runs per configuration; the best is reported")
+    parser.add_argument('--text-file', help="Synthesize this file instead of the built-in sample reply")
+    parser.add_argument('--output', help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    text = SAMPLE_TEXT
+    if args.text_file:
+        with open(args.text_file, 'r', encoding='utf-8') as f:
+            text = f.read()
+
+    cpus = os.cpu_count() or 1
+    print(f"Synthesizing {len(text)} characters with voice {args.voice} on {cpus} cores\n")
+    print(f"{'procs':>5} {'threads':>7} {'cores':>5} {'audio s':>8} {'wall s':>8} {'RTF':>7} {'speedup':>8}")
+
+    results = []
+    baseline = None
+    for threads in args.threads:
+        for processes in args.processes:
+            if processes * threads > cpus:
+                continue
+            result = benchmark(processes, threads, text, args.voice, args.runs)
+            if baseline is None:
+                baseline = result['wall_seconds']
+            result['speedup'] = round(baseline / result['wall_seconds'], 2)
+            results.append(result)
+            print(f"{result['processes']:>5} {result['threads_per_process']:>7} {result['cores_used']:>5} "
+                  f"{result['audio_seconds']:>8} {result['wall_seconds']:>8} {result['real_time_factor']:>7} "
+                  f"{result['speedup']:>7}x")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'cpus': cpus, 'characters': len(text), 'voice': args.voice, 'results': results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+if __name__ == "__main__":
+    main()
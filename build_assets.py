@@ -0,0 +1,147 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import brotli
+import rcssmin
+import rjsmin
+from assets import ASSET_DIR, MANIFEST_NAME, ENCODINGS
+
+STATIC_DIR = 'static'
+
+MINIFIERS = {
+    '.js': rjsmin.jsmin,
+    '.css': rcssmin.cssmin,
+}
+
+# Already-compressed formats (images, fonts) gain nothing from gzip or brotli
+COMPRESSIBLE = {'.js', '.css', '.svg', '.json', '.txt', '.html'}
+
+HASH_LENGTH = 12
+
+COMPRESSORS = {
+    'br': lambda data: brotli.compress(data, quality=11),
+    # mtime=0 keeps the output identical across builds of the same content
+    'gzip': lambda data: gzip.compress(data, compresslevel=9, mtime=0),
+}
+
+def source_files(static_dir: str) -> list:
+    """Lists the files under static/ to build, as '/'-separated paths relative to it."""
+    paths = []
+    for root, dirs, files in os.walk(static_dir):
+        if root == static_dir and ASSET_DIR in dirs:
+            dirs.remove(ASSET_DIR)
+        for name in files:
+            if not name.startswith('.'):
+                paths.append(os.path.relpath(os.path.join(root, name), static_dir).replace(os.sep, '/'))
+    return sorted(paths)
+
+def hashed_name(path: str, data: bytes) -> str:
+    """Inserts a hash of the content before the extension: js/chat.js -> js/chat.<hash>.js"""
+    base, ext = os.path.splitext(path)
+    return f"{base}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}"
+
+def write_file(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def build_asset(static_dir: str, out_dir: str, path: str, minify: bool = True) -> dict:
+    """
+    Writes the hashed copy of one static file and its compressed variants.
+
+    Returns:
+        dict: The manifest entry: hashed file name, available encodings and sizes
+    """
+    with open(os.path.join(static_dir, path), 'rb') as f:
+        source = f.read()
+
+    ext = os.path.splitext(path)[1].lower()
+    data = source
+    if minify and ext in MINIFIERS:
+        data = MINIFIERS[ext](source.decode('utf-8')).encode('utf-8')
+
+    name = hashed_name(path, data)
+    target = os.path.join(out_dir, name)
+    entry = {'file': name, 'size': len(data), 'source_size': len(source), 'encodings': {}}
+
+    # Content-addressed, so an existing file is already correct
+    if not os.path.exists(target):
+        write_file(target, data)
+
+    if ext in COMPRESSIBLE:
+        for encoding, suffix in ENCODINGS:
+            compressed_path = target + suffix
+            if not os.path.exists(compressed_path):
+                compressed = COMPRESSORS[encoding](data)
+                # A variant that is not smaller is not worth serving
+                if len(compressed) >= len(data):
+                    continue
+                write_file(compressed_path, compressed)
+            entry['encodings'][encoding] = os.path.getsize(compressed_path)
+    return entry
+
+def prune(out_dir: str, keep: set) -> int:
+    """Removes built files that no kept manifest refers to. Returns the number removed."""
+    removed = 0
+    for root, _, files in os.walk(out_dir, topdown=False):
+        for name in files:
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, out_dir).replace(os.sep, '/')
+            if rel == MANIFEST_NAME:
+                continue
+            for _, suffix in ENCODINGS:
+                if rel.endswith(suffix):
+                    rel = rel[:-len(suffix)]
+                    break
+            if rel not in keep:
+                os.remove(path)
+                removed += 1
+        if root != out_dir and not os.listdir(root):
+            os.rmdir(root)
+    return removed
+
+def load_manifest(path: str) -> dict:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def main():
+    parser = argparse.ArgumentParser(description="Build minified, fingerprinted and precompressed static assets.")
+    parser.add_argument('--static-dir', default=STATIC_DIR)
+    parser.add_argument('--no-minify', action='store_true', help="Fingerprint and compress without minifying")
+    parser.add_argument('--no-prune', action='store_true', help="Keep files from all earlier builds")
+    args = parser.parse_args()
+
+    out_dir = os.path.join(args.static_dir, ASSET_DIR)
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    previous = load_manifest(manifest_path)
+
+    assets = {}
+    for path in source_files(args.static_dir):
+        entry = build_asset(args.static_dir, out_dir, path, minify=not args.no_minify)
+        assets[path] = entry
+        sizes = ', '.join(f"{encoding} {size}" for encoding, size in entry['encodings'].items())
+        print(f"{path} -> {ASSET_DIR}/{entry['file']} ({entry['source_size']} -> {entry['size']} bytes"
+              f"{'; ' + sizes if sizes else ''})")
+
+    write_file(manifest_path, json.dumps({'assets': assets}, indent=2).encode('utf-8'))
+
+    if not args.no_prune:
+        # Pages rendered just before the build (or cached by a proxy) still point at the previous
+        # build's files, so those are kept for one more build
+        keep = {entry['file'] for entry in assets.values()}
+        keep.update(entry['file'] for entry in previous.get('assets', {}).values())
+        removed = prune(out_dir, keep)
+        if removed:
+            print(f"Removed {removed} file(s) from older builds")
+
+    print(f"\nWrote {len(assets)} assets to {out_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -4,4 +4,50 @@ import os
 SECRET_KEY = os.environ.get('SECRET_KEY', os.urandom(24))
 
 # Admin password - should be set through environment variable in production
-ADMIN_PASSWORD = os.environ.get('ADMIN_PASSWORD', 'SUPPORTIV_BRINGS_US_TOGETHER') 
\ No newline at end of file
+ADMIN_PASSWORD = os.environ.get('ADMIN_PASSWORD', 'SUPPORTIV_BRINGS_US_TOGETHER')
+
+# OpenAI-compatible API to send completions to; point it at benchmarks/mock_openai.py for load tests
+OPENAI_API_BASE = os.environ.get('OPENAI_API_BASE', 'https://api.openai.com/v1').rstrip('/')
+
+# Request profiling - profiles are kept in a bounded ring buffer on disk
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+PROFILE_MAX_ENTRIES = int(os.environ.get('PROFILE_MAX_ENTRIES', 50))
+
+# Requests slower than this are captured automatically with a per-phase breakdown
+SLOW_REQUEST_THRESHOLD_MS = float(os.environ.get('SLOW_REQUEST_THRESHOLD_MS', 2000))
+
+# Rendered page cache for the knowledge pages
+PAGE_CACHE_MAX_ENTRIES = int(os.environ.get('PAGE_CACHE_MAX_ENTRIES', 1000))
+
+# How long nginx may serve a cached anonymous page before revalidating (seconds)
+PAGE_CACHE_PROXY_MAX_AGE = int(os.environ.get('PAGE_CACHE_PROXY_MAX_AGE', 60))
+
+# Admission control for expensive endpoints (per worker). A single synthesis already spreads
+# across the worker's TTS process pool, so TTS defaults to one at a time.
+TTS_MAX_CONCURRENT = int(os.environ.get('TTS_MAX_CONCURRENT', 1))
+TTS_MAX_QUEUE = int(os.environ.get('TTS_MAX_QUEUE', 4))
+GENERATE_MAX_CONCURRENT = int(os.environ.get('GENERATE_MAX_CONCURRENT', 4))
+GENERATE_MAX_QUEUE = int(os.environ.get('GENERATE_MAX_QUEUE', 16))
+
+# Largest number of topics /api/generate/batch fills in with one completion
+GENERATE_BATCH_MAX_NODES = int(os.environ.get('GENERATE_BATCH_MAX_NODES', 10))
+
+# How long a queued request may wait for a slot before getting a 503 (seconds)
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 10))
+
+# Retry-After sent with 429/503 responses (seconds)
+ADMISSION_RETRY_AFTER = int(os.environ.get('ADMISSION_RETRY_AFTER', 5))
+
+# Parallel TTS: each gunicorn worker gets its own pool of synthesis processes. By default the
+# host's cores are split between the workers (WEB_CONCURRENCY, as read by gunicorn).
+# Set TTS_PROCESSES=0 to synthesize inside the web worker instead.
+TTS_THREADS_PER_PROCESS = int(os.environ.get('TTS_THREADS_PER_PROCESS', 2))
+TTS_PROCESSES = int(os.environ.get(
+    'TTS_PROCESSES',
+    max(1, (os.cpu_count() or 1) // (int(os.environ.get('WEB_CONCURRENCY', 4)) * TTS_THREADS_PER_PROCESS))
+))
+
+# Pre-rendered knowledge base audio (see generate_audio.py)
+KB_AUDIO_DIR = os.environ.get('KB_AUDIO_DIR', 'kb_audio')
+KB_AUDIO_VOICES = os.environ.get('KB_AUDIO_VOICES', 'af_heart').split(',')
+KB_AUDIO_FORMAT = os.environ.get('KB_AUDIO_FORMAT', 'flac')
@@ -0,0 +1,168 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
+import soundfile as sf
+from config import KB_AUDIO_DIR, KB_AUDIO_VOICES, KB_AUDIO_FORMAT, TTS_THREADS_PER_PROCESS
+from tts import SAMPLE_RATE, create_executor, synthesize
+
+KNOWLEDGE_BASE_FILE = "knowledge_base.json"
+
+# Metadata fields that get pre-rendered audio
+KB_AUDIO_FIELDS = ['importance', 'relation_to_parent', 'challenges', 'strategies', 'examples', 'action_steps']
+
+AUDIO_FORMATS = {
+    'flac': {'format': 'FLAC', 'subtype': 'PCM_16', 'mimetype': 'audio/flac'},
+    'ogg': {'format': 'OGG', 'subtype': 'VORBIS', 'mimetype': 'audio/ogg'},
+}
+
+def load_knowledge_base() -> List[Dict]:
+    """Load the knowledge base from file."""
+    with open(KNOWLEDGE_BASE_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def field_text(node: Dict, field: str) -> str:
+    """Returns the text to speak for a node's metadata field; list items become separate paragraphs."""
+    value = (node.get('metadata') or {}).get(field)
+    if isinstance(value, list):
+        return "\n\n".join(str(item).strip() for item in value if str(item).strip())
+    if isinstance(value, str):
+        return value.strip()
+    return ""
+
+def text_hash(text: str, voice: str) -> str:
+    """Hash of everything that determines the rendered audio."""
+    return hashlib.sha256(f"{voice}\n{KB_AUDIO_FORMAT}\n{text}".encode('utf-8')).hexdigest()[:16]
+
+def kb_audio_path(node_id: str, field: str, voice: str, digest: str) -> str:
+    """
+    Returns where the audio for a field is stored.
+
+    The text hash is part of the file name, so audio for edited text is never served and
+    unchanged fields are skipped simply because their file already exists.
+    """
+    return os.path.join(KB_AUDIO_DIR, voice, node_id, f"{field}-{digest}.{KB_AUDIO_FORMAT}")
+
+def find_kb_audio(node: Dict, field: str, voice: str) -> Optional[tuple]:
+    """Returns (path, digest) of up-to-date audio for a field, or None if it has not been rendered."""
+    text = field_text(node, field)
+    if not text:
+        return None
+    digest = text_hash(text, voice)
+    path = kb_audio_path(node['id'], field, voice, digest)
+    return (path, digest) if os.path.exists(path) else None
+
+def _safe_id(node_id) -> bool:
+    return isinstance(node_id, str) and node_id and os.path.basename(node_id) == node_id and node_id not in ('.', '..')
+
+def plan_jobs(knowledge_base: List[Dict], voices: List[str], force: bool = False) -> List[Dict]:
+    """Lists the (node, field, voice) combinations whose audio is missing or out of date."""
+    jobs = []
+    for node in knowledge_base:
+        if not _safe_id(node.get('id')):
+            print(f"Skipping node with unusable id: {node.get('id')!r}")
+            continue
+        for field in KB_AUDIO_FIELDS:
+            text = field_text(node, field)
+            if not text:
+                continue
+            for voice in voices:
+                digest = text_hash(text, voice)
+                path = kb_audio_path(node['id'], field, voice, digest)
+                if force or not os.path.exists(path):
+                    jobs.append({'node_id': node['id'], 'title': node.get('title', ''), 'field': field,
+                                 'voice': voice, 'text': text, 'path': path})
+    return jobs
+
+def render_job(job: Dict, executor, processes: int) -> float:
+    """Synthesizes one field and writes it to the store. Returns the audio length in seconds."""
+    audio = synthesize(job['text'], job['voice'], executor=executor, processes=processes)
+    if audio is None:
+        raise Exception("No audio generated")
+
+    os.makedirs(os.path.dirname(job['path']), exist_ok=True)
+    audio_format = AUDIO_FORMATS[KB_AUDIO_FORMAT]
+    tmp_path = f"{job['path']}.tmp"
+    sf.write(tmp_path, audio, SAMPLE_RATE, format=audio_format['format'], subtype=audio_format['subtype'])
+    os.replace(tmp_path, job['path'])
+    return len(audio) / SAMPLE_RATE
+
+def prune_store(knowledge_base: List[Dict], voices: List[str]) -> int:
+    """Removes audio for deleted nodes, emptied fields and superseded text. Returns the number of files removed."""
+    wanted = set()
+    for node in knowledge_base:
+        if not _safe_id(node.get('id')):
+            continue
+        for field in KB_AUDIO_FIELDS:
+            text = field_text(node, field)
+            if text:
+                for voice in voices:
+                    wanted.add(os.path.abspath(kb_audio_path(node['id'], field, voice, text_hash(text, voice))))
+
+    removed = 0
+    for voice in voices:
+        voice_dir = os.path.join(KB_AUDIO_DIR, voice)
+        if not os.path.isdir(voice_dir):
+            continue
+        for root, _, files in os.walk(voice_dir, topdown=False):
+            for name in files:
+                path = os.path.abspath(os.path.join(root, name))
+                if path not in wanted:
+                    os.remove(path)
+                    removed += 1
+            if root != voice_dir and not os.listdir(root):
+                os.rmdir(root)
+    return removed
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-render audio for knowledge base content.")
+    parser.add_argument('--voices', nargs='+', default=KB_AUDIO_VOICES, help="Voices to render")
+    parser.add_argument('--processes', type=int, help="Synthesis processes (default: cores / --threads)")
+    parser.add_argument('--threads', type=int, default=TTS_THREADS_PER_PROCESS, help="torch threads per process")
+    parser.add_argument('--force', action='store_true', help="Re-render everything, even unchanged text")
+    parser.add_argument('--no-prune', action='store_true', help="Keep audio for deleted or edited content")
+    args = parser.parse_args()
+    if args.processes is None:
+        # An offline job has the whole host, unlike the web workers that TTS_PROCESSES is sized for
+        args.processes = max(1, (os.cpu_count() or 1) // args.threads)
+
+    print("Loading knowledge base...")
+    knowledge_base = load_knowledge_base()
+
+    jobs = plan_jobs(knowledge_base, args.voices, args.force)
+    print(f"{len(jobs)} fields to render in {len(args.voices)} voice(s) with {args.processes} process(es)")
+
+    if jobs:
+        executor = create_executor(args.processes, args.threads)
+        start = time.time()
+        rendered = 0
+        audio_seconds = 0.0
+        try:
+            # Keep enough fields in flight that every synthesis process always has work queued
+            with ThreadPoolExecutor(max_workers=args.processes * 2) as dispatcher:
+                futures = {dispatcher.submit(render_job, job, executor, args.processes): job for job in jobs}
+                for future in as_completed(futures):
+                    job = futures[future]
+                    try:
+                        audio_seconds += future.result()
+                        rendered += 1
+                        print(f"[{rendered}/{len(jobs)}] {job['title']} / {job['field']} ({job['voice']})")
+                    except Exception as e:
+                        print(f"Error rendering '{job['title']}' / {job['field']} ({job['voice']}): {e}")
+        finally:
+            executor.shutdown()
+        elapsed = time.time() - start
+        print(f"\nRendered {rendered} fields ({audio_seconds:.0f}s of audio) in {elapsed:.0f}s")
+
+    if not args.no_prune:
+        removed = prune_store(knowledge_base, args.voices)
+        if removed:
+            print(f"Removed {removed} outdated audio file(s)")
+
+    print("\nAudio generation complete!")
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,13 @@ import os
 import time
 from typing import Dict, List, Optional
 from llm_utils import (
-    get_llm_response, 
-    get_parser_and_instructions,
+    TopicContent,
+    SubtopicContent,
+    generate_structured,
+    get_format_instructions,
     generate_topic_prompt,
-    generate_subtopic_prompt
+    generate_subtopic_prompt,
+    format_generation_stats
 )
 
 KNOWLEDGE_BASE_FILE = "knowledge_base.json"
@@ -79,15 +82,12 @@ def main():
             
         print(f"\nGenerating content for topic: {topic['title']}")
         try:
-            parser, format_instructions = get_parser_and_instructions(is_topic=True)
-            prompt = generate_topic_prompt(topic['title'], format_instructions)
-            response = get_llm_response(prompt)
-            
-            parsed_content = parser.parse(response)
-            formatted_content = format_content(parsed_content.dict())
+            prompt = generate_topic_prompt(topic['title'], get_format_instructions(is_topic=True))
+            parsed_content = generate_structured(prompt, TopicContent)
+            formatted_content = format_content(parsed_content.model_dump())
             
             topic["body"] = formatted_content
-            topic["metadata"] = parsed_content.dict()  # Store structured data for future use
+            topic["metadata"] = parsed_content.model_dump()  # Store structured data for future use
             
             save_knowledge_base(knowledge_base)
             print(f"Content generated and saved for '{topic['title']}'")
@@ -110,15 +110,12 @@ def main():
             
         print(f"\nGenerating content for subtopic: {subtopic['title']} (under {parent_topic['title']})")
         try:
-            parser, format_instructions = get_parser_and_instructions(is_topic=False)
-            prompt = generate_subtopic_prompt(subtopic['title'], parent_topic['title'], format_instructions)
-            response = get_llm_response(prompt)
-            
-            parsed_content = parser.parse(response)
-            formatted_content = format_content(parsed_content.dict())
+            prompt = generate_subtopic_prompt(subtopic['title'], parent_topic['title'], get_format_instructions(is_topic=False))
+            parsed_content = generate_structured(prompt, SubtopicContent)
+            formatted_content = format_content(parsed_content.model_dump())
             
             subtopic["body"] = formatted_content
-            subtopic["metadata"] = parsed_content.dict()  # Store structured data for future use
+            subtopic["metadata"] = parsed_content.model_dump()  # Store structured data for future use
             
             save_knowledge_base(knowledge_base)
             print(f"Content generated and saved for '{subtopic['title']}'")
@@ -126,6 +123,7 @@ def main():
         except Exception as e:
             print(f"Error generating content for '{subtopic['title']}': {e}")
     
+    print(f"\n{format_generation_stats()}")
     print("\nContent generation complete!")
 
 if __name__ == "__main__":
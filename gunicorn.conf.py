@@ -0,0 +1,7 @@
+# Loaded automatically by gunicorn when it is started from the repository directory
+
+def post_worker_init(worker):
+    # Load the TTS model as soon as a worker starts (including after a reload), rather than on
+    # its first TTS request, which would otherwise keep the requests queued behind it waiting
+    from tts import warm_up
+    warm_up()
@@ -0,0 +1,142 @@
+"""
+Precomputed layout for the knowledge network view.
+
+Nodes are placed as a tidy top-down tree built from parent_id: each node sits centred above its
+children, sibling subtrees never overlap, and separate trees are laid out side by side. The
+browser then draws the graph at these positions without running a physics simulation.
+"""
+import json
+import threading
+
+# Matches the node sizes used by static/js/knowledge.js
+NODE_WIDTHS = {'TOPIC': 800}
+DEFAULT_NODE_WIDTH = 300
+SIBLING_GAP = 80
+TREE_GAP = 300
+LEVEL_HEIGHT = 400
+
+def _build_forest(parents: list) -> tuple:
+    """
+    Turns a parent position per node into trees.
+
+    Nodes whose parent is missing become roots. A cycle is broken at its first node in
+    knowledge base order, so every node is placed exactly once.
+
+    Returns:
+        tuple: (roots, children, levels, order), where order lists nodes parents-first
+    """
+    count = len(parents)
+    children = [[] for _ in range(count)]
+    roots = []
+    for i, parent in enumerate(parents):
+        if parent is None or parent == i:
+            roots.append(i)
+        else:
+            children[parent].append(i)
+
+    placed = [False] * count
+    tree_children = [[] for _ in range(count)]
+    levels = [0] * count
+    order = []
+
+    def walk(root):
+        placed[root] = True
+        stack = [root]
+        while stack:
+            i = stack.pop()
+            order.append(i)
+            kids = [child for child in children[i] if not placed[child]]
+            for child in kids:
+                placed[child] = True
+                levels[child] = levels[i] + 1
+            tree_children[i] = kids
+            stack.extend(reversed(kids))
+
+    for root in roots:
+        walk(root)
+    # Anything left is part of a parent_id cycle
+    for i in range(count):
+        if not placed[i]:
+            roots.append(i)
+            walk(i)
+
+    return roots, tree_children, levels, order
+
+def compute_layout(snapshot) -> dict:
+    """
+    Lays out every node of a knowledge base snapshot.
+
+    Returns:
+        dict: {'version', 'nodes': [{'id', 'label', 'category', 'x', 'y', 'level'}],
+            'edges': [[parent id, child id]]}, with nodes in knowledge base order
+    """
+    count = len(snapshot)
+    ids = [snapshot.node_id(i) for i in range(count)]
+    position = {node_id: i for i, node_id in enumerate(ids)}
+    parents = [position.get(snapshot.parent_id(i)) for i in range(count)]
+    categories = [snapshot.category(i) for i in range(count)]
+    widths = [NODE_WIDTHS.get(category, DEFAULT_NODE_WIDTH) for category in categories]
+
+    roots, children, levels, order = _build_forest(parents)
+
+    # Width of each subtree, leaves first
+    spans = widths[:]
+    for i in reversed(order):
+        if children[i]:
+            row = sum(spans[child] for child in children[i]) + SIBLING_GAP * (len(children[i]) - 1)
+            spans[i] = max(widths[i], row)
+
+    # Centre each node over its subtree and share the subtree's width out among its children
+    x = [0.0] * count
+    left = [0.0] * count
+    cursor = 0.0
+    for root in roots:
+        left[root] = cursor
+        cursor += spans[root] + TREE_GAP
+    for i in order:
+        x[i] = left[i] + spans[i] / 2
+        if children[i]:
+            row = sum(spans[child] for child in children[i]) + SIBLING_GAP * (len(children[i]) - 1)
+            child_left = left[i] + (spans[i] - row) / 2
+            for child in children[i]:
+                left[child] = child_left
+                child_left += spans[child] + SIBLING_GAP
+
+    # Centre the whole drawing on the origin
+    offset = (cursor - TREE_GAP) / 2 if roots else 0.0
+    return {
+        'version': snapshot.version,
+        'nodes': [
+            {
+                'id': ids[i],
+                'label': snapshot.title(i) or 'Untitled Topic',
+                'category': categories[i],
+                'x': round(x[i] - offset),
+                'y': levels[i] * LEVEL_HEIGHT,
+                'level': levels[i]
+            }
+            for i in range(count)
+        ],
+        'edges': [[ids[i], ids[child]] for i in range(count) for child in children[i]]
+    }
+
+class LayoutCache:
+    """
+    Holds the serialized layout of the current snapshot.
+
+    The layout is computed once per knowledge base version; concurrent requests for a new
+    version wait for the one computation instead of each running their own.
+    """
+
+    def __init__(self):
+        self._version = None
+        self._body = None
+        self._lock = threading.Lock()
+
+    def get(self, snapshot) -> bytes:
+        with self._lock:
+            if self._version != snapshot.version:
+                layout = compute_layout(snapshot)
+                self._body = json.dumps(layout, separators=(',', ':')).encode('utf-8')
+                self._version = snapshot.version
+            return self._body
@@ -0,0 +1,348 @@
+"""
+Compact binary snapshot of the knowledge base, shared between workers through mmap.
+
+Layout: header (magic, version, generation, source mtime, counts, section offsets), an interned
+string table, a fixed-size index entry per node (id, parent, title and category string ids, fingerprint,
+value offset), node positions sorted by id, then the encoded nodes. Snapshots are written to a
+uniquely named temporary file and renamed into place, so readers never need a lock.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+MAGIC = b'CKBS'
+FORMAT_VERSION = 2
+
+HEADER = struct.Struct('<4sHHQqdIIQQQQ')
+STRING_ENTRY = struct.Struct('<II')
+INDEX_ENTRY = struct.Struct('<IIIIQQ')
+POSITION = struct.Struct('<I')
+
+NO_STRING = 0xFFFFFFFF
+
+TAG_NULL, TAG_TRUE, TAG_FALSE, TAG_INT, TAG_FLOAT, TAG_STR, TAG_LIST, TAG_DICT = range(8)
+
+_U8 = struct.Struct('<B')
+_U32 = struct.Struct('<I')
+_I64 = struct.Struct('<q')
+_F64 = struct.Struct('<d')
+
+def node_fingerprint(node: dict) -> int:
+    """Returns a 64-bit content hash of a node, stable across compiles."""
+    digest = hashlib.sha1(json.dumps(node, sort_keys=True).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'little')
+
+class _Encoder:
+    def __init__(self):
+        self.strings = {}
+        self.values = bytearray()
+
+    def intern(self, value: str) -> int:
+        sid = self.strings.get(value)
+        if sid is None:
+            sid = self.strings[value] = len(self.strings)
+        return sid
+
+    def encode(self, value) -> None:
+        out = self.values
+        if value is None:
+            out += _U8.pack(TAG_NULL)
+        elif value is True:
+            out += _U8.pack(TAG_TRUE)
+        elif value is False:
+            out += _U8.pack(TAG_FALSE)
+        elif isinstance(value, int):
+            out += _U8.pack(TAG_INT) + _I64.pack(value)
+        elif isinstance(value, float):
+            out += _U8.pack(TAG_FLOAT) + _F64.pack(value)
+        elif isinstance(value, str):
+            out += _U8.pack(TAG_STR) + _U32.pack(self.intern(value))
+        elif isinstance(value, list):
+            out += _U8.pack(TAG_LIST) + _U32.pack(len(value))
+            for item in value:
+                self.encode(item)
+        elif isinstance(value, dict):
+            out += _U8.pack(TAG_DICT) + _U32.pack(len(value))
+            for key, item in value.items():
+                out += _U32.pack(self.intern(str(key)))
+                self.encode(item)
+        else:
+            raise TypeError(f"Cannot encode value of type {type(value).__name__}")
+
+def read_header(path: str):
+    """Returns the unpacked header of a snapshot file, or None if it is missing or not a snapshot."""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read(HEADER.size)
+    except FileNotFoundError:
+        return None
+    if len(data) < HEADER.size:
+        return None
+    header = HEADER.unpack(data)
+    if header[0] != MAGIC or header[1] != FORMAT_VERSION:
+        return None
+    return header
+
+def compile_snapshot(json_path: str, snapshot_path: str) -> int:
+    """
+    Compiles the knowledge base JSON file into a binary snapshot.
+
+    Args:
+        json_path (str): Path of knowledge_base.json
+        snapshot_path (str): Where to write the snapshot; replaced atomically
+
+    Returns:
+        int: The generation of the new snapshot
+    """
+    source_mtime_ns = os.stat(json_path).st_mtime_ns
+    with open(json_path, 'r', encoding='utf-8') as f:
+        nodes = json.load(f)
+
+    previous = read_header(snapshot_path)
+    generation = previous[3] + 1 if previous else 1
+
+    encoder = _Encoder()
+    index = []
+    for node in nodes:
+        offset = len(encoder.values)
+        encoder.encode(node)
+        parent_id = node.get('parent_id')
+        index.append((
+            encoder.intern(str(node.get('id', ''))),
+            encoder.intern(str(parent_id)) if parent_id is not None else NO_STRING,
+            encoder.intern(str(node.get('title', ''))),
+            encoder.intern(str(node['category'])) if node.get('category') is not None else NO_STRING,
+            node_fingerprint(node),
+            offset
+        ))
+
+    strings = list(encoder.strings)
+    encoded_strings = [s.encode('utf-8') for s in strings]
+    by_id = sorted(range(len(index)), key=lambda i: strings[index[i][0]])
+
+    strings_offset = HEADER.size
+    blob_offset = strings_offset + STRING_ENTRY.size * len(strings)
+    index_offset = blob_offset + sum(len(s) for s in encoded_strings)
+    by_id_offset = index_offset + INDEX_ENTRY.size * len(index)
+    values_offset = by_id_offset + POSITION.size * len(index)
+
+    out = bytearray(HEADER.pack(
+        MAGIC, FORMAT_VERSION, 0, generation, source_mtime_ns, time.time(),
+        len(index), len(strings), strings_offset, index_offset, by_id_offset, values_offset
+    ))
+    position = 0
+    for data in encoded_strings:
+        out += STRING_ENTRY.pack(position, len(data))
+        position += len(data)
+    for data in encoded_strings:
+        out += data
+    for entry in index:
+        out += INDEX_ENTRY.pack(*entry)
+    for i in by_id:
+        out += POSITION.pack(i)
+    out += encoder.values
+
+    write_atomic(snapshot_path, out)
+    return generation
+
+def write_atomic(path: str, data: bytes) -> None:
+    """
+    Writes a file through a uniquely named temporary file and renames it into place, so
+    concurrent writers in any thread or process never share a temporary file.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                    prefix=f"{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        # mkstemp creates the file readable by its owner only
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+class KnowledgeSnapshot:
+    """Read-only, lazily decoded view of a compiled knowledge base snapshot."""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._stat = os.fstat(f.fileno())
+            self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, _, self.generation, self.source_mtime_ns, self.compiled_at,
+         self._node_count, self._string_count, strings_offset, self._index_offset,
+         self._by_id_offset, self._values_offset) = HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a knowledge base snapshot")
+        # Unique even if the snapshot file is deleted and its generation count starts over
+        self.version = f"{self.generation}-{self.source_mtime_ns:x}"
+        self._strings_offset = strings_offset
+        self._blob_offset = strings_offset + STRING_ENTRY.size * self._string_count
+
+    def __len__(self):
+        return self._node_count
+
+    def __iter__(self):
+        for i in range(self._node_count):
+            yield self.node(i)
+
+    def is_file(self, st) -> bool:
+        """Checks whether this snapshot was mapped from the file described by an os.stat result."""
+        return (st.st_ino, st.st_mtime_ns) == (self._stat.st_ino, self._stat.st_mtime_ns)
+
+    def string(self, sid: int) -> str:
+        start, length = STRING_ENTRY.unpack_from(self._buf, self._strings_offset + STRING_ENTRY.size * sid)
+        start += self._blob_offset
+        return self._buf[start:start + length].decode('utf-8')
+
+    def _entry(self, i: int):
+        return INDEX_ENTRY.unpack_from(self._buf, self._index_offset + INDEX_ENTRY.size * i)
+
+    def node_id(self, i: int) -> str:
+        return self.string(self._entry(i)[0])
+
+    def parent_id(self, i: int):
+        parent_sid = self._entry(i)[1]
+        return None if parent_sid == NO_STRING else self.string(parent_sid)
+
+    def title(self, i: int) -> str:
+        return self.string(self._entry(i)[2])
+
+    def category(self, i: int):
+        category_sid = self._entry(i)[3]
+        return None if category_sid == NO_STRING else self.string(category_sid)
+
+    def titles(self):
+        """Yields every node's title in knowledge base order without decoding the nodes."""
+        for i in range(self._node_count):
+            yield self.title(i)
+
+    def node(self, i: int) -> dict:
+        """Decodes the node at position i into a fresh dict."""
+        value, _ = self._decode(self._values_offset + self._entry(i)[5])
+        return value
+
+    def position(self, node_id: str):
+        """Returns the position of the node with the given id, or None."""
+        lo, hi = 0, self._node_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            i = POSITION.unpack_from(self._buf, self._by_id_offset + POSITION.size * mid)[0]
+            current = self.node_id(i)
+            if current == node_id:
+                return i
+            if current < node_id:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def get(self, node_id):
+        """Returns the decoded node with the given id, or None."""
+        if node_id is None:
+            return None
+        i = self.position(node_id)
+        return None if i is None else self.node(i)
+
+    def children(self, node_id: str) -> list:
+        """Returns the decoded direct children of a node, in knowledge base order."""
+        return [self.node(i) for i in range(self._node_count) if self.parent_id(i) == node_id]
+
+    def index(self) -> dict:
+        """Returns a mapping of node id to (parent id, fingerprint) without decoding the nodes."""
+        result = {}
+        for i in range(self._node_count):
+            id_sid, parent_sid, _, _, fingerprint, _ = self._entry(i)
+            parent_id = None if parent_sid == NO_STRING else self.string(parent_sid)
+            result[self.string(id_sid)] = (parent_id, fingerprint)
+        return result
+
+    def _decode(self, offset: int):
+        buf = self._buf
+        tag = buf[offset]
+        offset += 1
+        if tag == TAG_NULL:
+            return None, offset
+        if tag == TAG_TRUE:
+            return True, offset
+        if tag == TAG_FALSE:
+            return False, offset
+        if tag == TAG_INT:
+            return _I64.unpack_from(buf, offset)[0], offset + 8
+        if tag == TAG_FLOAT:
+            return _F64.unpack_from(buf, offset)[0], offset + 8
+        if tag == TAG_STR:
+            return self.string(_U32.unpack_from(buf, offset)[0]), offset + 4
+        count = _U32.unpack_from(buf, offset)[0]
+        offset += 4
+        if tag == TAG_LIST:
+            items = []
+            for _ in range(count):
+                item, offset = self._decode(offset)
+                items.append(item)
+            return items, offset
+        if tag == TAG_DICT:
+            result = {}
+            for _ in range(count):
+                key = self.string(_U32.unpack_from(buf, offset)[0])
+                result[key], offset = self._decode(offset + 4)
+            return result, offset
+        raise ValueError(f"Corrupt snapshot: unknown tag {tag} at offset {offset - 1}")
+
+class SnapshotManager:
+    """
+    Keeps a worker's view of the knowledge base snapshot current.
+
+    current() recompiles the snapshot when knowledge_base.json has changed since it was built,
+    and maps a newer snapshot file when another worker has replaced it. Threads that find the
+    snapshot stale at the same time wait for a single recompile.
+    """
+
+    def __init__(self, json_path: str, snapshot_path: str):
+        self.json_path = json_path
+        self.snapshot_path = snapshot_path
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def _stale(self) -> bool:
+        header = read_header(self.snapshot_path)
+        return header is None or header[4] != os.stat(self.json_path).st_mtime_ns
+
+    def current(self) -> KnowledgeSnapshot:
+        if self._stale():
+            with self._lock:
+                # Another thread may have recompiled it while this one waited
+                if self._stale():
+                    return self._rebuild()
+
+        snapshot = self._snapshot
+        st = os.stat(self.snapshot_path)
+        if snapshot is None or not snapshot.is_file(st):
+            # The old mapping stays valid for requests still holding it and is closed once unreferenced
+            snapshot = self._snapshot = KnowledgeSnapshot(self.snapshot_path)
+        return snapshot
+
+    def rebuild(self) -> KnowledgeSnapshot:
+        """Compiles a fresh snapshot from the JSON file and maps it."""
+        with self._lock:
+            return self._rebuild()
+
+    def _rebuild(self) -> KnowledgeSnapshot:
+        compile_snapshot(self.json_path, self.snapshot_path)
+        self._snapshot = KnowledgeSnapshot(self.snapshot_path)
+        return self._snapshot
+
+if __name__ == '__main__':
+    import sys
+    source = sys.argv[1] if len(sys.argv) > 1 else 'knowledge_base.json'
+    target = sys.argv[2] if len(sys.argv) > 2 else 'knowledge_base.snapshot'
+    generation = compile_snapshot(source, target)
+    print(f"Compiled {source} into {target} (generation {generation}, {os.path.getsize(target)} bytes)")
@@ -1,8 +1,10 @@
+import json
 import os
+import re
 import requests
-from typing import List, Optional
-from pydantic import BaseModel, Field, field_validator
-from langchain.output_parsers import PydanticOutputParser
+from typing import List, Optional, Type
+from pydantic import BaseModel, Field, field_validator, ValidationError
+from config import OPENAI_API_BASE
 
 # Ensure API key is set
 from local_settings import OPENAI_API_KEY_GPT4
@@ -35,7 +37,17 @@ class SubtopicContent(BaseModel):
             raise ValueError("List cannot be empty")
         return v
 
-def _llm(messages, model_name='gpt-4o-mini', temp=0):
+# Running counts of structured generation outcomes, reported by format_generation_stats()
+generation_stats = {
+    'generations': 0,     # Structured generations requested
+    'calls': 0,           # Completions requested, including retries
+    'parse_failures': 0,  # Responses that did not validate as returned
+    'repaired': 0,        # Of those, responses fixed by local repair
+    'retries': 0,         # Extra completions needed after a response could not be repaired
+    'failed': 0           # Generations abandoned after all retries
+}
+
+def _llm(messages, model_name='gpt-4o-mini', temp=0, response_format=None):
     """Make an LLM API call"""
     headers = {
         'Content-Type': 'application/json',
@@ -49,9 +61,11 @@ def _llm(messages, model_name='gpt-4o-mini', temp=0):
         'top_p': 1,
         'temperature': temp
     }
+    if response_format:
+        data['response_format'] = response_format
     
     response = requests.post(
-        "https://api.openai.com/v1/chat/completions",
+        f"{OPENAI_API_BASE}/chat/completions",
         headers=headers,
         json=data
     )
@@ -97,12 +111,146 @@ Focus on:
 
 Ensure each section is detailed and specific to the needs of autistic individuals in corporate environments."""
 
-def get_parser_and_instructions(is_topic: bool) -> tuple[PydanticOutputParser, str]:
-    """Get the appropriate parser and format instructions based on content type."""
-    parser = PydanticOutputParser(
-        pydantic_object=TopicContent if is_topic else SubtopicContent
-    )
-    return parser, parser.get_format_instructions()
+def _strict_schema(schema):
+    """Adapts a pydantic JSON schema to what OpenAI's strict structured outputs accept."""
+    if isinstance(schema, list):
+        return [_strict_schema(item) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+
+    strict = {key: _strict_schema(value) for key, value in schema.items() if key not in ('title', 'properties')}
+    if 'properties' in schema:
+        strict['properties'] = {name: _strict_schema(value) for name, value in schema['properties'].items()}
+    if strict.get('type') == 'object':
+        strict['additionalProperties'] = False
+        strict['required'] = list(strict.get('properties', {}))
+    return strict
+
+def get_response_format(model: Type[BaseModel]) -> dict:
+    """Builds a JSON-schema response format from a pydantic model so the API enforces the structure."""
+    return {
+        'type': 'json_schema',
+        'json_schema': {
+            'name': model.__name__,
+            'schema': _strict_schema(model.model_json_schema()),
+            'strict': True
+        }
+    }
+
+def get_format_instructions(is_topic: bool) -> str:
+    """Get short format instructions describing the fields to return."""
+    model = TopicContent if is_topic else SubtopicContent
+    fields = "\n".join(f"- {name}: {field.description}" for name, field in model.model_fields.items())
+    return f"Respond with a JSON object containing these fields:\n{fields}"
+
+def _normalize_key(key: str) -> str:
+    key = re.sub(r'(?<=[a-z])(?=[A-Z])', '_', str(key))
+    return re.sub(r'[\s\-]+', '_', key.strip()).lower()
+
+def repair_json_response(text: str, model: Type[BaseModel]) -> dict:
+    """
+    Recovers a JSON object for the model from a near-miss response.
+
+    Handles code fences, prose around the object, trailing commas, the object being wrapped
+    in a single outer key, differently styled keys and list fields returned as a single string.
+
+    Args:
+        text (str): The raw response
+        model (Type[BaseModel]): The model the object should match
+
+    Returns:
+        dict: The repaired object, still to be validated
+
+    Raises:
+        ValueError: If no JSON object can be recovered
+    """
+    text = re.sub(r'^```[a-zA-Z]*\s*|\s*```$', '', text.strip())
+    start, end = text.find('{'), text.rfind('}')
+    if start == -1 or end <= start:
+        raise ValueError("No JSON object found in response")
+    candidate = text[start:end + 1]
+    try:
+        data = json.loads(candidate)
+    except json.JSONDecodeError:
+        data = json.loads(re.sub(r',\s*([}\]])', r'\1', candidate))
+    if not isinstance(data, dict):
+        raise ValueError("Response is not a JSON object")
+
+    fields = model.model_fields
+    if len(data) == 1 and not set(map(_normalize_key, data)) & set(fields):
+        inner = next(iter(data.values()))
+        if isinstance(inner, dict):
+            data = inner
+
+    data = {_normalize_key(key): value for key, value in data.items()}
+    for name, field in fields.items():
+        value = data.get(name)
+        if field.annotation == List[str] and isinstance(value, str):
+            data[name] = [line.strip().lstrip('•-*1234567890. ') for line in value.splitlines() if line.strip()]
+    return data
+
+def generate_structured(prompt: str, model: Type[BaseModel], system_prompt: Optional[str] = None,
+                        max_retries: int = 2) -> BaseModel:
+    """
+    Generate content that validates against a pydantic model.
+
+    The API is asked for JSON matching the model's schema. A response that still fails
+    validation is repaired locally first; only if that fails is the model asked again,
+    with the validation errors, as a follow-up in the same conversation.
+
+    Args:
+        prompt (str): The main prompt to send to the LLM
+        model (Type[BaseModel]): The model to validate the response against
+        system_prompt (Optional[str]): Optional system prompt to set context
+        max_retries (int): Follow-up completions allowed after the first one
+
+    Returns:
+        BaseModel: The validated content
+    """
+    messages = []
+    if system_prompt:
+        messages.append({"role": "system", "content": system_prompt})
+    messages.append({"role": "user", "content": prompt})
+    response_format = get_response_format(model)
+    generation_stats['generations'] += 1
+
+    for attempt in range(max_retries + 1):
+        if attempt:
+            generation_stats['retries'] += 1
+        generation_stats['calls'] += 1
+        response = _llm(messages, model_name='gpt-4o-mini', temp=0.7, response_format=response_format)
+        if response is None:
+            continue
+
+        try:
+            return model.model_validate_json(response)
+        except ValidationError:
+            generation_stats['parse_failures'] += 1
+
+        try:
+            content = model.model_validate(repair_json_response(response, model))
+            generation_stats['repaired'] += 1
+            return content
+        except (ValueError, ValidationError) as e:
+            error = e
+
+        messages.append({"role": "assistant", "content": response})
+        messages.append({"role": "user", "content": f"That response was invalid: {error}\n"
+                                                    f"Reply again with only the corrected JSON object."})
+
+    generation_stats['failed'] += 1
+    raise Exception(f"Failed to generate valid {model.__name__} after {max_retries + 1} attempts")
+
+def format_generation_stats() -> str:
+    """Summarizes structured generation outcomes, including parse-failure and retry rates."""
+    stats = generation_stats
+    if not stats['generations'] or not stats['calls']:
+        return "No structured generations"
+    return (f"{stats['generations']} generations, {stats['calls']} completions | "
+            f"parse failures: {stats['parse_failures']} ({stats['parse_failures'] / stats['calls']:.0%} of responses), "
+            f"{stats['repaired']} repaired locally | "
+            f"retries: {stats['retries']} ({stats['retries'] / stats['generations']:.2f} per generation) | "
+            f"failed: {stats['failed']}")
 
 def get_llm_response(prompt: str, system_prompt: Optional[str] = None) -> str:
     """
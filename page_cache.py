@@ -0,0 +1,115 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+class CachedPage:
+    def __init__(self, html: str, depends_on: set, last_modified: float, generation=None, node_id=None):
+        self.html = html
+        self.depends_on = depends_on
+        self.node_id = node_id
+        self.generation = generation
+        self.last_modified = last_modified
+        self.etag = hashlib.sha1(html.encode('utf-8')).hexdigest()
+
+class PageCache:
+    """
+    In-process cache of rendered pages that tracks which knowledge base nodes each page was built from.
+
+    When the knowledge base generation changes (through this worker or any other), the node
+    fingerprints are diffed against the last version this worker saw. Pages that show a changed
+    node are dropped, along with the pages of its old and new parent, which list it as a child.
+    Siblings are kept, since their pages only show the parent.
+    """
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._fingerprints = None
+        self._parents = {}
+        self._generation = None
+        self._last_modified = None
+        self._lock = threading.Lock()
+
+    @property
+    def last_modified(self):
+        return self._last_modified
+
+    def refresh(self, generation, load_index, last_modified: float = None) -> None:
+        """
+        Invalidate the pages affected by a knowledge base change, if there was one.
+
+        Args:
+            generation: Identifier of the current knowledge base version
+            load_index (callable): Returns a mapping of node id to (parent id, fingerprint);
+                only called when the generation changed
+            last_modified (float): Timestamp of the current version, used for Last-Modified
+        """
+        if generation == self._generation:
+            return
+
+        index = load_index()
+        fingerprints = {node_id: fingerprint for node_id, (_, fingerprint) in index.items()}
+        parents = {node_id: parent_id for node_id, (parent_id, _) in index.items()}
+
+        with self._lock:
+            if self._fingerprints is None:
+                # First sync for this worker; nothing rendered yet can be trusted
+                self._entries.clear()
+            else:
+                changed = {node_id for node_id in fingerprints.keys() | self._fingerprints.keys()
+                           if fingerprints.get(node_id) != self._fingerprints.get(node_id)}
+                # A new or moved child is not among its parent page's dependencies yet
+                parent_pages = set()
+                for node_id in changed:
+                    parent_pages.add(parents.get(node_id))
+                    parent_pages.add(self._parents.get(node_id))
+                parent_pages.discard(None)
+                self._invalidate(changed, parent_pages)
+
+            self._fingerprints = fingerprints
+            self._parents = parents
+            self._generation = generation
+            self._last_modified = last_modified
+
+    def get(self, key):
+        with self._lock:
+            page = self._entries.get(key)
+            if page is not None:
+                self._entries.move_to_end(key)
+            return page
+
+    def put(self, key, html: str, depends_on, generation=None, node_id=None) -> CachedPage:
+        """
+        Store a rendered page.
+
+        A page rendered from an older generation than the cache has seen is returned but not
+        stored: the change that superseded it may already have been invalidated, and the stale
+        page would otherwise stay cached until its nodes change again.
+
+        Args:
+            key: Cache key, e.g. ('topic', topic_id, logged_in, asset build)
+            html (str): The rendered page
+            depends_on: Ids of the knowledge base nodes the page was rendered from
+            generation: Knowledge base version the page was rendered from; None for pages
+                that do not use knowledge base data
+            node_id: Id of the node the page is about, if any
+
+        Returns:
+            CachedPage: The page entry
+        """
+        with self._lock:
+            page = CachedPage(html, set(depends_on), self._last_modified, generation, node_id)
+            if generation is not None and generation != self._generation:
+                return page
+            self._entries[key] = page
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return page
+
+    def _invalidate(self, node_ids: set, page_node_ids: set) -> None:
+        """Drops pages that depend on any of node_ids or are about any of page_node_ids."""
+        stale = [key for key, page in self._entries.items()
+                 if page.depends_on & node_ids or page.node_id in page_node_ids]
+        for key in stale:
+            del self._entries[key]
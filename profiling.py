@@ -0,0 +1,197 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from flask import g, request, session, has_request_context
+from config import PROFILE_DIR, PROFILE_MAX_ENTRIES, SLOW_REQUEST_THRESHOLD_MS
+
+# Phases reported in the per-request breakdown, in display order
+PHASES = ['kb_load', 'retrieval', 'context_build', 'upstream', 'serialization']
+
+PROFILE_ID_PATTERN = re.compile(r'^\d+-[0-9a-f]{8}$')
+
+# Only one cProfile profiler can be active per process (on 3.12+ enabling a second one raises, and
+# an active one also records every other thread), so concurrent profile requests take turns
+_profiler_lock = threading.Lock()
+
+@contextmanager
+def phase(name: str):
+    """
+    Time a block of work and add it to the current request's phase breakdown.
+
+    Outside of a request (e.g. in scripts) the block simply runs untimed.
+
+    Args:
+        name (str): The phase name, normally one of PHASES
+    """
+    if not has_request_context():
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = g.setdefault('phase_timings', {})
+        timings[name] = timings.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+def wants_profile() -> bool:
+    """Check whether the current request asked to be profiled and is allowed to be."""
+    if request.headers.get('X-Profile') != '1' and request.args.get('profile') != '1':
+        return False
+    # Only read the session when asked: touching it makes Flask add Vary: Cookie to the response,
+    # which would keep shared caches from storing static assets and anonymous pages
+    return bool(session.get('logged_in'))
+
+def _start_request():
+    g.request_start = time.perf_counter()
+    g.phase_timings = {}
+    g.profiler = None
+    g.profile_skipped = False
+    if wants_profile():
+        if _profiler_lock.acquire(blocking=False):
+            g.profiler = cProfile.Profile()
+            g.profiler_running = True
+            g.profiler.enable()
+        else:
+            # Another request in this worker is being profiled; record phase timings only
+            g.profile_skipped = True
+
+def _stop_profiler(exc=None):
+    if g.pop('profiler_running', False):
+        g.profiler.disable()
+        _profiler_lock.release()
+
+def _finish_request(response):
+    start = g.get('request_start')
+    if start is None:
+        return response
+
+    _stop_profiler()
+    profiler = g.get('profiler')
+
+    total_ms = (time.perf_counter() - start) * 1000
+    timings = g.get('phase_timings', {})
+
+    if profiler is not None or total_ms >= SLOW_REQUEST_THRESHOLD_MS:
+        try:
+            profile_id = save_profile(
+                path=request.path,
+                method=request.method,
+                status=response.status_code,
+                total_ms=total_ms,
+                timings=timings,
+                profiler=profiler
+            )
+            if profiler is not None:
+                response.headers['X-Profile-Id'] = profile_id
+        except OSError as e:
+            print(f"Error saving request profile: {e}")
+
+    if g.get('profile_skipped'):
+        response.headers['X-Profile-Skipped'] = 'another request is being profiled'
+    if profiler is not None or g.get('profile_skipped'):
+        response.headers['Server-Timing'] = ', '.join(
+            f"{name};dur={duration:.1f}" for name, duration in timings.items()
+        )
+    return response
+
+def init_profiling(app):
+    """Register the request hooks that collect phase timings and optional profiles."""
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    # Also runs when a request fails before after_request, so the profiler lock is never left held
+    app.teardown_request(_stop_profiler)
+
+def save_profile(path: str, method: str, status: int, total_ms: float, timings: dict, profiler=None) -> str:
+    """
+    Write a captured request to the on-disk ring buffer, evicting the oldest entries.
+
+    Args:
+        path (str): The request path
+        method (str): The HTTP method
+        status (int): The response status code
+        total_ms (float): Total request time in milliseconds
+        timings (dict): Phase name to milliseconds
+        profiler (cProfile.Profile): Optional profiler whose stats should be stored
+
+    Returns:
+        str: The id of the saved profile
+    """
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profile_id = f"{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}"
+
+    record = {
+        'id': profile_id,
+        'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'path': path,
+        'method': method,
+        'status': status,
+        'total_ms': round(total_ms, 2),
+        'phases': {name: round(duration, 2) for name, duration in timings.items()},
+        'profiled': profiler is not None,
+        'stats': None
+    }
+
+    if profiler is not None:
+        profiler.dump_stats(os.path.join(PROFILE_DIR, f"{profile_id}.prof"))
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(40)
+        record['stats'] = stream.getvalue()
+
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.json"), 'w') as f:
+        json.dump(record, f)
+
+    _prune_profiles()
+    return profile_id
+
+def _prune_profiles():
+    ids = sorted(name[:-5] for name in os.listdir(PROFILE_DIR) if name.endswith('.json'))
+    for profile_id in ids[:-PROFILE_MAX_ENTRIES]:
+        for ext in ('.json', '.prof'):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, profile_id + ext))
+            except FileNotFoundError:
+                pass
+
+def list_profiles() -> list:
+    """Return summaries of the captured profiles, newest first."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+
+    profiles = []
+    for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(PROFILE_DIR, name), 'r') as f:
+                record = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            # Another worker may have evicted or be writing this entry
+            continue
+        record.pop('stats', None)
+        profiles.append(record)
+    return profiles
+
+def load_profile(profile_id: str):
+    """Load a single captured profile, or None if it does not exist."""
+    if not PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    try:
+        with open(os.path.join(PROFILE_DIR, f"{profile_id}.json"), 'r') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+def profile_stats_path(profile_id: str):
+    """Return the path of the raw cProfile dump for a profile, or None if there is none."""
+    if not PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    path = os.path.abspath(os.path.join(PROFILE_DIR, f"{profile_id}.prof"))
+    return path if os.path.exists(path) else None
@@ -49,6 +49,38 @@ Key guidelines:
 - For lists, provide exactly the same number of items as the current content
 - If no current content exists, provide 3-4 items for lists'''
 
+# Instruction and required format for each generatable field
+FIELD_PROMPTS = {
+    'title': {
+        'instruction': "Generate a clear and concise title for a topic about autism in corporate settings.",
+        'format': "Single line, 3-7 words"
+    },
+    'importance': {
+        'instruction': "Generate a brief explanation of why this topic is important for understanding autism in corporate settings.",
+        'format': "Single concise sentence"
+    },
+    'relation_to_parent': {
+        'instruction': "Generate a brief explanation of how this subtopic relates to its parent topic in the context of autism in corporate settings.",
+        'format': "Single concise sentence"
+    },
+    'challenges': {
+        'instruction': "Generate key challenges related to this topic in corporate settings.",
+        'format': "Bullet points, match number of current items"
+    },
+    'strategies': {
+        'instruction': "Generate effective strategies to address this topic in corporate settings.",
+        'format': "Bullet points, match number of current items"
+    },
+    'examples': {
+        'instruction': "Generate concrete examples related to this topic in corporate settings.",
+        'format': "Bullet points, match number of current items"
+    },
+    'action_steps': {
+        'instruction': "Generate actionable steps to implement regarding this topic in corporate settings.",
+        'format': "Bullet points, match number of current items"
+    }
+}
+
 def get_field_specific_prompt(field: str, current_value: str, context: dict, user_instructions: str = "") -> str:
     """
     Returns a field-specific prompt with current value and context.
@@ -62,37 +94,6 @@ def get_field_specific_prompt(field: str, current_value: str, context: dict, use
     Returns:
         str: The formatted prompt
     """
-    base_prompts = {
-        'title': {
-            'instruction': "Generate a clear and concise title for a topic about autism in corporate settings.",
-            'format': "Single line, 3-7 words"
-        },
-        'importance': {
-            'instruction': "Generate a brief explanation of why this topic is important for understanding autism in corporate settings.",
-            'format': "Single concise sentence"
-        },
-        'relation_to_parent': {
-            'instruction': "Generate a brief explanation of how this subtopic relates to its parent topic in the context of autism in corporate settings.",
-            'format': "Single concise sentence"
-        },
-        'challenges': {
-            'instruction': "Generate key challenges related to this topic in corporate settings.",
-            'format': "Bullet points, match number of current items"
-        },
-        'strategies': {
-            'instruction': "Generate effective strategies to address this topic in corporate settings.",
-            'format': "Bullet points, match number of current items"
-        },
-        'examples': {
-            'instruction': "Generate concrete examples related to this topic in corporate settings.",
-            'format': "Bullet points, match number of current items"
-        },
-        'action_steps': {
-            'instruction': "Generate actionable steps to implement regarding this topic in corporate settings.",
-            'format': "Bullet points, match number of current items"
-        }
-    }
-
     prompt = f"""Field to generate: {field}
 
 Current value:
@@ -102,10 +103,10 @@ Topic context:
 {json.dumps(context, indent=2)}
 
 Instruction:
-{base_prompts[field]['instruction']}
+{FIELD_PROMPTS[field]['instruction']}
 
 Required format:
-{base_prompts[field]['format']}"""
+{FIELD_PROMPTS[field]['format']}"""
 
     if user_instructions:
         prompt += f"\n\nAdditional instructions from user:\n{user_instructions}"
@@ -114,6 +115,50 @@ Required format:
 
     return prompt
 
+def get_batch_generation_prompt(nodes: list, user_instructions: str = "") -> str:
+    """
+    Returns one prompt that asks for several fields of one or more topics at once.
+
+    Each field's instruction is included once, however many topics ask for it, and each
+    topic's context is included once for all of its fields.
+
+    Args:
+        nodes (list): One dict per topic with 'key' (its key in the response), 'context'
+            (the topic data) and 'fields' (field name -> (min, max) number of list items,
+            or None for text fields)
+        user_instructions (str): Optional user-provided instructions for the generation
+
+    Returns:
+        str: The formatted prompt
+    """
+    fields = []
+    for node in nodes:
+        for field in node['fields']:
+            if field not in fields:
+                fields.append(field)
+
+    prompt = "Generate new content for the fields listed under each topic below.\n\nField instructions:"
+    for field in fields:
+        prompt += f"\n- {field}: {FIELD_PROMPTS[field]['instruction']} Format: {FIELD_PROMPTS[field]['format']}"
+
+    for node in nodes:
+        prompt += f"\n\nTopic {node['key']}:\n{json.dumps(node['context'], separators=(',', ':'))}\nFields to generate:"
+        for field, items in node['fields'].items():
+            if items is None:
+                prompt += f"\n- {field}"
+            elif items[0] == items[1]:
+                prompt += f"\n- {field} (exactly {items[0]} items)"
+            else:
+                prompt += f"\n- {field} ({items[0]}-{items[1]} items)"
+
+    if user_instructions:
+        prompt += f"\n\nAdditional instructions from user:\n{user_instructions}"
+
+    prompt += ("\n\nAnswer with one object per topic key. Keep each field similar in length and structure "
+               "to its current value in the topic context (if one exists).")
+
+    return prompt
+
 def get_field_specific_prompts() -> dict:
     """
     Returns a dictionary of base prompts for content generation.
@@ -5,7 +5,12 @@ class CORSRequestHandler(SimpleHTTPRequestHandler):
     def end_headers(self):
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET')
-        self.send_header('Cache-Control', 'no-store, no-cache, must-revalidate')
+        # Built assets have a content hash in their name and never change; everything else is
+        # revalidated so edits show up on the next reload
+        if '/dist/' in self.path:
+            self.send_header('Cache-Control', 'public, max-age=31536000, immutable')
+        else:
+            self.send_header('Cache-Control', 'no-cache')
         return super().end_headers()
 
     def do_OPTIONS(self):
@@ -1,16 +1,151 @@
+// Chat history is kept in IndexedDB: one record per chat with its token totals, and one record
+// per message keyed by [chatId, index]. Saving a message appends a single record, and a chat's
+// history is read a page at a time.
+const CHAT_DB_NAME = 'corpotism-chats';
+const CHAT_DB_VERSION = 1;
+const MESSAGE_PAGE_SIZE = 50;
+
+class ChatStore {
+    static open() {
+        return new Promise((resolve, reject) => {
+            const request = indexedDB.open(CHAT_DB_NAME, CHAT_DB_VERSION);
+            request.onupgradeneeded = () => {
+                const db = request.result;
+                db.createObjectStore('chats', { keyPath: 'id' });
+                db.createObjectStore('messages', { keyPath: ['chatId', 'index'] });
+            };
+            request.onsuccess = () => resolve(new ChatStore(request.result));
+            request.onerror = () => reject(request.error);
+        });
+    }
+
+    constructor(db) {
+        this.db = db;
+        // Let a newer version of the page in another tab upgrade the database
+        this.db.onversionchange = () => this.db.close();
+    }
+
+    // Runs fn inside a transaction and resolves once it commits, with the result of the
+    // request fn returned (if any)
+    transaction(stores, mode, fn) {
+        return new Promise((resolve, reject) => {
+            const tx = this.db.transaction(stores, mode);
+            const result = fn(tx);
+            tx.oncomplete = () => resolve(result instanceof IDBRequest ? result.result : result);
+            tx.onerror = () => reject(tx.error);
+            tx.onabort = () => reject(tx.error);
+        });
+    }
+
+    async getChats() {
+        const chats = await this.transaction('chats', 'readonly', tx => tx.objectStore('chats').getAll());
+        return chats.sort((a, b) => a.createdAt - b.createdAt);
+    }
+
+    putChat(chat) {
+        return this.transaction('chats', 'readwrite', tx => { tx.objectStore('chats').put(chat); });
+    }
+
+    // Stores a message at the end of a chat, together with the chat's updated length
+    appendMessage(chat, index, message) {
+        return this.transaction(['chats', 'messages'], 'readwrite', tx => {
+            tx.objectStore('messages').put({ chatId: chat.id, index, ...message });
+            tx.objectStore('chats').put(chat);
+        });
+    }
+
+    // Returns the messages with start <= index < end, oldest first
+    getMessages(chatId, start, end) {
+        return this.transaction('messages', 'readonly', tx =>
+            tx.objectStore('messages').getAll(IDBKeyRange.bound([chatId, start], [chatId, end], false, true))
+        );
+    }
+
+    deleteChat(chatId) {
+        return this.transaction(['chats', 'messages'], 'readwrite', tx => {
+            tx.objectStore('chats').delete(chatId);
+            tx.objectStore('messages').delete(IDBKeyRange.bound([chatId, 0], [chatId, Infinity]));
+        });
+    }
+
+    // One-time move of chats saved by earlier versions, which kept every chat in a single
+    // localStorage entry. The entry is only removed once everything has been written.
+    async migrateLocalStorage() {
+        const saved = localStorage.getItem('chats');
+        if (!saved) return;
+
+        let chats;
+        try {
+            chats = JSON.parse(saved);
+        } catch (error) {
+            console.error('Could not read saved chats:', error);
+            return;
+        }
+
+        const entries = Object.entries(chats || {});
+        const now = Date.now();
+        await this.transaction(['chats', 'messages'], 'readwrite', tx => {
+            entries.forEach(([id, chat], position) => {
+                // The oldest format stored just the message array
+                if (Array.isArray(chat)) {
+                    chat = { messages: chat };
+                }
+                const messages = chat.messages || [];
+                messages.forEach((message, index) => {
+                    tx.objectStore('messages').put({
+                        chatId: id,
+                        index,
+                        role: message.role,
+                        content: message.content,
+                        tokens: message.tokens || null
+                    });
+                });
+                tx.objectStore('chats').put({
+                    id,
+                    createdAt: now - entries.length + position,
+                    totalInputTokens: chat.totalInputTokens || 0,
+                    totalOutputTokens: chat.totalOutputTokens || 0,
+                    messageCount: chat.messageCount || 0,
+                    length: messages.length
+                });
+            });
+        });
+        localStorage.removeItem('chats');
+    }
+}
+
 class Chat {
     constructor() {
         this.apiKey = localStorage.getItem('openai_api_key');
-        this.chats = this.loadChats(); // { guid: { messages: [], totalInputTokens, totalOutputTokens, messageCount } }
-        this.currentChatId = this.loadCurrentChatId();
+        this.store = null;
+        this.chats = {}; // { guid: { id, createdAt, totalInputTokens, totalOutputTokens, messageCount, length } }
+        this.currentChatId = null;
+        this.loadedFrom = 0; // Index of the oldest message of the current chat shown so far
         this.voices = {};
         this.currentVoice = localStorage.getItem('selected_voice') || 'af_heart';
         this.loadVoices();
         this.initializeElements();
         this.attachEventListeners();
         this.updateUIState();
+        this.ready = this.loadHistory();
+    }
+
+    async loadHistory() {
+        try {
+            this.store = await ChatStore.open();
+            await this.store.migrateLocalStorage();
+            (await this.store.getChats()).forEach(chat => {
+                this.chats[chat.id] = chat;
+            });
+        } catch (error) {
+            console.error('Error loading chat history:', error);
+        }
+        if (Object.keys(this.chats).length === 0) {
+            await this.addChat();
+        }
+        this.currentChatId = this.loadCurrentChatId();
         this.renderChatList();
-        this.loadChatMessages();
+        await this.loadChatMessages();
     }
 
     async loadVoices() {
@@ -121,33 +256,14 @@ class Chat {
     }
 
     // --- Chat Storage ---
-    loadChats() {
-        const chats = localStorage.getItem('chats');
-        if (chats) {
-            const parsed = JSON.parse(chats);
-            // Migrate old format if needed
-            for (const guid in parsed) {
-                if (Array.isArray(parsed[guid])) {
-                    parsed[guid] = {
-                        messages: parsed[guid],
-                        totalInputTokens: 0,
-                        totalOutputTokens: 0,
-                        messageCount: 0
-                    };
-                }
-            }
-            return parsed;
-        }
-        // If no chats, create one
+    async addChat() {
         const guid = this.generateGUID();
-        const initial = {};
-        initial[guid] = { messages: [], totalInputTokens: 0, totalOutputTokens: 0, messageCount: 0 };
-        localStorage.setItem('chats', JSON.stringify(initial));
-        localStorage.setItem('currentChatId', guid);
-        return initial;
-    }
-    saveChats() {
-        localStorage.setItem('chats', JSON.stringify(this.chats));
+        const chat = { id: guid, createdAt: Date.now(), totalInputTokens: 0, totalOutputTokens: 0, messageCount: 0, length: 0 };
+        this.chats[guid] = chat;
+        if (this.store) {
+            await this.store.putChat(chat).catch(error => console.error('Error saving chat:', error));
+        }
+        return guid;
     }
     loadCurrentChatId() {
         let id = localStorage.getItem('currentChatId');
@@ -194,11 +310,9 @@ class Chat {
         }
     }
 
-    createNewChat() {
-        const guid = this.generateGUID();
-        this.chats[guid] = { messages: [], totalInputTokens: 0, totalOutputTokens: 0, messageCount: 0 };
-        this.currentChatId = guid;
-        this.saveChats();
+    async createNewChat() {
+        await this.ready;
+        this.currentChatId = await this.addChat();
         this.saveCurrentChatId();
         this.renderChatList();
         this.loadChatMessages();
@@ -216,24 +330,33 @@ class Chat {
         const chatIds = Object.keys(this.chats);
         if (chatIds.length <= 1) return; // Don't delete last chat
         delete this.chats[this.currentChatId];
+        if (this.store) {
+            this.store.deleteChat(this.currentChatId).catch(error => console.error('Error deleting chat:', error));
+        }
         // Pick another chat to switch to
         const nextId = chatIds.find(id => id !== this.currentChatId) || Object.keys(this.chats)[0];
         this.currentChatId = nextId;
-        this.saveChats();
         this.saveCurrentChatId();
         this.renderChatList();
         this.loadChatMessages();
     }
 
     // --- Chat Message UI ---
-    loadChatMessages() {
+    // Shows the most recent page of the current chat; older pages are loaded on request
+    async loadChatMessages() {
         if (!this.chatMessages) return;
+        const chatId = this.currentChatId;
+        const chat = this.chats[chatId] || { totalInputTokens: 0, totalOutputTokens: 0, messageCount: 0, length: 0 };
         this.chatMessages.innerHTML = '';
-        const chat = this.chats[this.currentChatId] || { messages: [], totalInputTokens: 0, totalOutputTokens: 0, messageCount: 0 };
-        const messages = chat.messages;
         this.totalInputTokens = chat.totalInputTokens || 0;
         this.totalOutputTokens = chat.totalOutputTokens || 0;
         this.messageCount = chat.messageCount || 0;
+        this.updateTotalTokens();
+
+        this.loadedFrom = Math.max(0, chat.length - MESSAGE_PAGE_SIZE);
+        const messages = await this.readMessages(chatId, this.loadedFrom, chat.length);
+        if (chatId !== this.currentChatId) return; // Switched again while loading
+
         if (messages.length === 0 && this.welcomeMessage) {
             this.welcomeMessage.style.display = '';
         } else if (this.welcomeMessage) {
@@ -242,7 +365,51 @@ class Chat {
         messages.forEach(msg => {
             this.addMessageToChat(msg.role, msg.content, msg.tokens, false);
         });
-        this.updateTotalTokens();
+        this.updateLoadEarlierButton();
+        this.chatMessages.scrollTop = this.chatMessages.scrollHeight;
+    }
+
+    async loadEarlierMessages() {
+        const chatId = this.currentChatId;
+        const end = this.loadedFrom;
+        const start = Math.max(0, end - MESSAGE_PAGE_SIZE);
+        const messages = await this.readMessages(chatId, start, end);
+        if (chatId !== this.currentChatId || end !== this.loadedFrom) return;
+
+        // Keep the messages already on screen where they are while older ones are added above
+        const previousHeight = this.chatMessages.scrollHeight;
+        const firstMessage = this.chatMessages.querySelector('.chat-message');
+        messages.forEach(msg => {
+            this.chatMessages.insertBefore(this.createMessageElement(msg.role, msg.content), firstMessage);
+        });
+        this.loadedFrom = start;
+        this.updateLoadEarlierButton();
+        this.chatMessages.scrollTop += this.chatMessages.scrollHeight - previousHeight;
+    }
+
+    async readMessages(chatId, start, end) {
+        if (!this.store || start >= end) return [];
+        try {
+            return await this.store.getMessages(chatId, start, end);
+        } catch (error) {
+            console.error('Error loading messages:', error);
+            return [];
+        }
+    }
+
+    updateLoadEarlierButton() {
+        let button = this.chatMessages.querySelector('.load-earlier');
+        if (this.loadedFrom === 0) {
+            if (button) button.remove();
+            return;
+        }
+        if (!button) {
+            button = document.createElement('button');
+            button.className = 'load-earlier block mx-auto text-sm text-blue-500 hover:text-blue-700';
+            button.textContent = 'Load earlier messages';
+            button.addEventListener('click', () => this.loadEarlierMessages());
+        }
+        this.chatMessages.insertBefore(button, this.chatMessages.firstChild);
     }
 
     // --- UI State ---
@@ -290,6 +457,7 @@ class Chat {
 
     async sendMessage() {
         if (!this.apiKey) return;
+        await this.ready;
         const message = this.chatInput.value.trim();
         if (!message) return;
         this.chatInput.value = '';
@@ -340,6 +508,16 @@ class Chat {
     }
 
     addMessageToChat(role, content, tokens = null, scroll = true) {
+        this.chatMessages.appendChild(this.createMessageElement(role, content));
+        if (scroll) {
+            this.chatMessages.scrollTop = this.chatMessages.scrollHeight;
+        }
+        if (tokens) {
+            this.updateTotalTokens();
+        }
+    }
+
+    createMessageElement(role, content) {
         // Add a style block for audio controls at the start of the method
         if (!document.getElementById('audio-styles')) {
             const styleSheet = document.createElement('style');
@@ -357,14 +535,14 @@ class Chat {
         }
 
         const messageDiv = document.createElement('div');
-        messageDiv.className = 'mb-4';
+        messageDiv.className = 'chat-message mb-4';
         const messageContent = role === 'error' 
             ? `<div class="bg-red-50 text-red-700 p-3 rounded-lg">${content}</div>`
             : `<div class="flex items-start">
                 <div class="flex-shrink-0">
                     ${role === 'user' 
                         ? '<div class="bg-blue-500 text-white p-2 rounded-full">You</div>' 
-                        : '<img src="/static/favicon.png" alt="AI" class="w-10 h-10 rounded-full border border-gray-200" />'}
+                        : `<img src="${window.assistantAvatarUrl || '/static/favicon.png'}" alt="AI" class="w-10 h-10 rounded-full border border-gray-200" />`}
                 </div>
                 <div class="ml-3 flex-grow">
                     <div class="p-3 rounded-lg shadow-sm ${role === 'assistant' ? 'bg-blue-50' : 'bg-white'}">
@@ -447,20 +625,16 @@ class Chat {
             });
         }
 
-        this.chatMessages.appendChild(messageDiv);
-        if (scroll) {
-            this.chatMessages.scrollTop = this.chatMessages.scrollHeight;
-        }
-        if (tokens) {
-            this.updateTotalTokens();
-        }
+        return messageDiv;
     }
 
     saveMessage(role, content, tokens = null) {
         const chat = this.chats[this.currentChatId];
-        if (!chat) return;
-        chat.messages.push({ role, content, tokens });
-        this.saveChats();
+        if (!chat || !this.store) return;
+        // The index is taken straight away, so messages saved in quick succession keep their order
+        const index = chat.length++;
+        this.store.appendMessage(chat, index, { role, content, tokens })
+            .catch(error => console.error('Error saving message:', error));
     }
 
     formatMessage(message) {
@@ -480,7 +654,9 @@ class Chat {
         chat.totalInputTokens = this.totalInputTokens;
         chat.totalOutputTokens = this.totalOutputTokens;
         chat.messageCount = this.messageCount;
-        this.saveChats();
+        if (this.store) {
+            this.store.putChat(chat).catch(error => console.error('Error saving chat:', error));
+        }
     }
 }
 
@@ -1,22 +1,60 @@
 document.addEventListener('DOMContentLoaded', function() {
     // Create a container for the network
     const container = document.getElementById('network-container');
+    const lodToggle = document.getElementById('toggleDetail');
     let network = null;
-    let knowledgeBaseData = [];
+    let nodes = null;
+    let edges = null;
+    let graph = { nodes: [], edges: [] };
+
+    // Level of detail: large graphs start with only the top levels shown and the rest collapsed
+    // into their ancestors until clicked
+    const LOD_AUTO_THRESHOLD = 150;
+    const LOD_VISIBLE_LEVELS = 2;
+    let levelOfDetail = false;
+    let graphNodes = new Map();
+    let childrenOf = new Map();
+    let descendantCounts = new Map();
+    let collapsed = new Set();
+
+    // Full topics are only fetched when their details are shown
+    const topicRequests = new Map();
+
+    function loadTopic(topicId) {
+        if (!topicRequests.has(topicId)) {
+            const request = fetch(`/api/knowledge/${encodeURIComponent(topicId)}`)
+                .then(response => response.ok ? response.json() : null)
+                .catch(() => null);
+            topicRequests.set(topicId, request);
+        }
+        return topicRequests.get(topicId);
+    }
+
+    async function loadKnowledgeBase() {
+        const response = await fetch('/api/knowledge');
+        if (!response.ok) {
+            throw new Error('Failed to fetch knowledge base');
+        }
+        return response.json();
+    }
 
     // Initialize the network visualization
     async function initNetwork() {
         try {
-            const response = await fetch('/api/knowledge');
+            // The server lays the graph out, so there is no physics simulation to wait for
+            const response = await fetch('/api/knowledge/graph');
             if (!response.ok) {
-                throw new Error('Failed to fetch knowledge base');
+                throw new Error('Failed to fetch knowledge graph');
             }
-            knowledgeBaseData = await response.json();
-            console.log('Fetched knowledge base:', knowledgeBaseData);
-            
+            graph = await response.json();
+            topicRequests.clear();
+
             // Create the network data
-            const { nodes, edges } = createNetworkData(knowledgeBaseData);
-            
+            const data = createNetworkData(graph);
+            nodes = data.nodes;
+            edges = data.edges;
+            indexSubtrees(graph);
+
             const options = {
                 nodes: {
                     shape: 'box',
@@ -37,32 +75,6 @@ document.addEventListener('DOMContentLoaded', function() {
                         size: 15,
                         x: 5,
                         y: 5
-                    },
-                    scaling: {
-                        min: 32,
-                        max: 64,
-                        label: {
-                            enabled: true,
-                            min: 32,
-                            max: 64,
-                            drawThreshold: 3,
-                            maxVisible: 64
-                        }
-                    },
-                    color: {
-                        background: topic => topic.category === 'TOPIC' ? '#4CAF50' : '#2196F3',
-                        border: topic => topic.category === 'TOPIC' ? '#2E7D32' : '#1565C0',
-                        highlight: {
-                            background: topic => topic.category === 'TOPIC' ? '#81C784' : '#64B5F6',
-                            border: topic => topic.category === 'TOPIC' ? '#2E7D32' : '#1565C0'
-                        }
-                    },
-                    widthConstraint: {
-                        minimum: topic => topic.category === 'TOPIC' ? 600 : 200,
-                        maximum: topic => topic.category === 'TOPIC' ? 800 : 300
-                    },
-                    heightConstraint: {
-                        minimum: topic => topic.category === 'TOPIC' ? 150 : 50
                     }
                 },
                 edges: {
@@ -81,36 +93,18 @@ document.addEventListener('DOMContentLoaded', function() {
                     },
                     smooth: {
                         enabled: true,
-                        type: 'dynamic',
-                        roundness: 0.5,
-                        forceDirection: 'none'
+                        type: 'cubicBezier',
+                        forceDirection: 'vertical',
+                        roundness: 0.4
                     },
                     selectionWidth: 2,
                     hoverWidth: 2
                 },
                 physics: {
-                    enabled: true,
-                    solver: 'forceAtlas2Based',
-                    forceAtlas2Based: {
-                        gravitationalConstant: -3000,
-                        centralGravity: 0.01,
-                        springLength: 400,
-                        springConstant: 0.05,
-                        damping: 0.4,
-                        avoidOverlap: 1.5
-                    },
-                    stabilization: {
-                        enabled: true,
-                        iterations: 2000,
-                        updateInterval: 25,
-                        fit: true
-                    },
-                    adaptiveTimestep: true,
-                    minVelocity: 0.5
+                    enabled: false
                 },
                 layout: {
-                    randomSeed: 2,
-                    improvedLayout: true,
+                    improvedLayout: false,
                     hierarchical: {
                         enabled: false
                     }
@@ -122,37 +116,26 @@ document.addEventListener('DOMContentLoaded', function() {
                     dragView: true,
                     navigationButtons: true,
                     keyboard: true,
-                    hideEdgesOnDrag: false,
+                    hideEdgesOnDrag: true,
                     hideEdgesOnZoom: false
                 }
             };
-            
-            // Create the network
-            network = new vis.Network(container, { nodes, edges }, options);
-
-            // Add loading message
-            const loadingDiv = document.createElement('div');
-            loadingDiv.className = 'fixed top-4 right-4 bg-blue-500 text-white px-6 py-3 rounded shadow-lg z-50';
-            loadingDiv.textContent = 'Organizing network...';
-            document.body.appendChild(loadingDiv);
-
-            // Remove loading message after stabilization
-            network.once('stabilizationIterationsDone', function() {
-                loadingDiv.remove();
-                // Fit the network to view after stabilization
-                network.fit({
-                    animation: {
-                        duration: 1000,
-                        easingFunction: 'easeInOutQuad'
-                    }
-                });
-            });
-            
-            // Handle node click events
+
+            if (network) {
+                network.destroy();
+            }
+            network = new vis.Network(container, data, options);
+            setLevelOfDetail(graph.nodes.length > LOD_AUTO_THRESHOLD);
+
+            // Handle node click events; a collapsed node opens up before it shows its details
             network.on('click', function(params) {
                 if (params.nodes.length > 0) {
                     const nodeId = params.nodes[0];
-                    showTopicDetails(nodeId);
+                    if (collapsed.has(nodeId)) {
+                        expandNode(nodeId);
+                    } else {
+                        showTopicDetails(nodeId);
+                    }
                 }
             });
 
@@ -170,13 +153,12 @@ document.addEventListener('DOMContentLoaded', function() {
             });
 
             // Add hover tooltips
-            network.on('hoverNode', function(params) {
+            network.on('hoverNode', async function(params) {
                 const node = nodes.get(params.node);
-                const topic = knowledgeBaseData.find(t => t.id === node.id);
+                if (!node || node.title) return;
+                const topic = await loadTopic(node.id);
                 if (topic) {
-                    const tooltip = createTooltipContent(topic);
-                    node.title = tooltip;
-                    nodes.update(node);
+                    nodes.update({ id: node.id, title: createTooltipContent(topic) });
                 }
             });
 
@@ -190,142 +172,122 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
-    function createNetworkData(topics) {
-        if (!Array.isArray(topics)) {
-            console.error('Invalid topics data:', topics);
-            return { nodes: new vis.DataSet(), edges: new vis.DataSet() };
-        }
-
-        const nodes = new vis.DataSet();
-        const edges = new vis.DataSet();
-        
-        // Debug log
-        console.log('Creating network with topics:', topics);
-        
-        // First pass: Create all nodes
-        topics.forEach(topic => {
-            if (!topic || typeof topic !== 'object' || !topic.id) {
-                console.error('Invalid topic:', topic);
-                return;
-            }
-
-            // Debug log
-            console.log('Creating node for topic:', topic);
-
-            nodes.add({
-                id: topic.id,
-                label: topic.title || 'Untitled Topic',
-                category: topic.category,
+    function createNetworkData(graph) {
+        const nodes = new vis.DataSet(graph.nodes.map(node => {
+            const isTopic = node.category === 'TOPIC';
+            return {
+                id: node.id,
+                label: node.label,
+                level: node.level,
+                x: node.x,
+                y: node.y,
                 color: {
-                    background: topic.category === 'TOPIC' ? '#4CAF50' : '#2196F3',
-                    border: topic.category === 'TOPIC' ? '#2E7D32' : '#1565C0',
+                    background: isTopic ? '#4CAF50' : '#2196F3',
+                    border: isTopic ? '#2E7D32' : '#1565C0',
                     highlight: {
-                        background: topic.category === 'TOPIC' ? '#81C784' : '#64B5F6',
-                        border: topic.category === 'TOPIC' ? '#2E7D32' : '#1565C0'
+                        background: isTopic ? '#81C784' : '#64B5F6',
+                        border: isTopic ? '#2E7D32' : '#1565C0'
                     }
                 },
                 font: {
                     color: '#000000',
-                    size: topic.category === 'TOPIC' ? 48 : 18,
+                    size: isTopic ? 48 : 18,
                     face: 'arial',
-                    bold: topic.category === 'TOPIC',
-                    mod: topic.category === 'TOPIC' ? 'bold' : undefined
+                    bold: isTopic,
+                    mod: isTopic ? 'bold' : undefined
                 },
-                size: topic.category === 'TOPIC' ? 120 : 30,
+                size: isTopic ? 120 : 30,
                 widthConstraint: {
-                    minimum: topic.category === 'TOPIC' ? 600 : 200,
-                    maximum: topic.category === 'TOPIC' ? 800 : 300
+                    minimum: isTopic ? 600 : 200,
+                    maximum: isTopic ? 800 : 300
                 },
                 heightConstraint: {
-                    minimum: topic.category === 'TOPIC' ? 150 : 50
+                    minimum: isTopic ? 150 : 50
                 }
-            });
+            };
+        }));
+
+        const edges = new vis.DataSet(graph.edges.map(([from, to]) => ({
+            id: `${from}->${to}`,
+            from: from,
+            to: to,
+            color: {
+                color: '#2B7CE9',
+                highlight: '#1B5299',
+                hover: '#1B5299'
+            }
+        })));
+
+        return { nodes, edges };
+    }
+
+    // Records each node's children and how many nodes sit below it
+    function indexSubtrees(graph) {
+        graphNodes = new Map(graph.nodes.map(node => [node.id, node]));
+        childrenOf = new Map();
+        graph.edges.forEach(([from, to]) => {
+            if (!childrenOf.has(from)) childrenOf.set(from, []);
+            childrenOf.get(from).push(to);
         });
-        
-        // Second pass: Create all edges with proper connections
-        topics.forEach(topic => {
-            // Debug log parent relationships
-            console.log('Processing topic:', {
-                id: topic.id,
-                title: topic.title,
-                parent_id: topic.parent_id,
-                category: topic.category
-            });
 
-            // Check for parent_id directly on the topic object
-            if (topic && topic.id && topic.parent_id) {
-                // Verify both nodes exist before creating edge
-                const parentNode = nodes.get(topic.parent_id);
-                const currentNode = nodes.get(topic.id);
-                
-                if (parentNode && currentNode) {
-                    console.log('Creating edge:', {
-                        from: topic.parent_id,
-                        to: topic.id,
-                        fromNode: parentNode.label,
-                        toNode: currentNode.label
-                    });
-                    
-                    try {
-                        edges.add({
-                            from: topic.parent_id,
-                            to: topic.id,
-                            arrows: {
-                                to: {
-                                    enabled: true,
-                                    scaleFactor: 1.5
-                                }
-                            },
-                            color: {
-                                color: '#2B7CE9',
-                                highlight: '#1B5299',
-                                hover: '#1B5299'
-                            },
-                            width: 3,
-                            smooth: {
-                                type: 'cubicBezier',
-                                forceDirection: 'vertical',
-                                roundness: 0.4
-                            }
-                        });
-                    } catch (error) {
-                        console.error('Failed to create edge:', error, {
-                            from: topic.parent_id,
-                            to: topic.id
-                        });
-                    }
-                } else {
-                    console.warn('Missing nodes for edge:', {
-                        parent_exists: !!parentNode,
-                        parent_id: topic.parent_id,
-                        current_exists: !!currentNode,
-                        current_id: topic.id
-                    });
-                }
+        // The server lists every parent before its children, so walking backwards counts leaves first
+        descendantCounts = new Map();
+        const parentOf = new Map(graph.edges.map(([from, to]) => [to, from]));
+        const order = [];
+        const stack = graph.nodes.filter(node => !parentOf.has(node.id)).map(node => node.id);
+        while (stack.length) {
+            const id = stack.pop();
+            order.push(id);
+            (childrenOf.get(id) || []).forEach(child => stack.push(child));
+        }
+        for (let i = order.length - 1; i >= 0; i--) {
+            const id = order[i];
+            const below = (childrenOf.get(id) || []).reduce((sum, child) => sum + 1 + descendantCounts.get(child), 0);
+            descendantCounts.set(id, below);
+        }
+    }
+
+    function nodeLabel(node) {
+        if (!collapsed.has(node.id)) return node.label;
+        return `${node.label}\n(+${descendantCounts.get(node.id)} more)`;
+    }
+
+    function setLevelOfDetail(enabled) {
+        levelOfDetail = enabled;
+        collapsed = new Set();
+        graph.nodes.forEach(node => {
+            if (enabled && node.level === LOD_VISIBLE_LEVELS - 1 && childrenOf.has(node.id)) {
+                collapsed.add(node.id);
             }
         });
-
-        // Verify edge creation
-        const createdEdges = edges.get();
-        console.log('Created edges:', createdEdges.length, createdEdges);
-        
-        // Verify node-edge consistency
-        const nodeIds = new Set(nodes.get().map(n => n.id));
-        const invalidEdges = createdEdges.filter(edge => 
-            !nodeIds.has(edge.from) || !nodeIds.has(edge.to)
-        );
-        
-        if (invalidEdges.length > 0) {
-            console.warn('Found invalid edges:', invalidEdges);
+        nodes.update(graph.nodes.map(node => ({
+            id: node.id,
+            hidden: enabled && node.level >= LOD_VISIBLE_LEVELS,
+            label: nodeLabel(node)
+        })));
+        edges.update(graph.edges.map(([from, to]) => ({
+            id: `${from}->${to}`,
+            hidden: enabled && graphNodes.get(to).level >= LOD_VISIBLE_LEVELS
+        })));
+        if (lodToggle) {
+            lodToggle.textContent = enabled ? 'Expand All' : 'Collapse Subtrees';
         }
-        
-        // Debug log final network data
-        console.log('Created network data:', {
-            nodes: nodes.get(),
-            edges: edges.get()
+        network.fit();
+    }
+
+    // Shows a collapsed node's children, each collapsed in turn if it has children of its own
+    function expandNode(nodeId) {
+        collapsed.delete(nodeId);
+        const children = childrenOf.get(nodeId) || [];
+        children.forEach(childId => {
+            if (childrenOf.has(childId)) collapsed.add(childId);
         });
-        
-        return { nodes, edges };
+        nodes.update([nodeId, ...children].map(id => ({
+            id,
+            hidden: false,
+            label: nodeLabel(graphNodes.get(id))
+        })));
+        edges.update(children.map(childId => ({ id: `${nodeId}->${childId}`, hidden: false })));
     }
 
     function createTooltipContent(topic) {
@@ -353,8 +315,8 @@ document.addEventListener('DOMContentLoaded', function() {
         return tooltip;
     }
 
-    function showTopicDetails(topicId) {
-        const topic = knowledgeBaseData.find(t => t.id === topicId);
+    async function showTopicDetails(topicId) {
+        const topic = await loadTopic(topicId);
         if (!topic) return;
 
         // Remove any existing popups
@@ -513,6 +475,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 }
             };
 
+            const knowledgeBaseData = await loadKnowledgeBase();
             knowledgeBaseData.push(newTopic);
             
             // Save to server
@@ -541,6 +504,8 @@ document.addEventListener('DOMContentLoaded', function() {
         }
 
         try {
+            let knowledgeBaseData = await loadKnowledgeBase();
+
             // Remove the topic and all its children
             const removeTopicAndChildren = (id) => {
                 knowledgeBaseData = knowledgeBaseData.filter(topic => {
@@ -582,4 +547,8 @@ document.addEventListener('DOMContentLoaded', function() {
     if (isLoggedIn) {
         document.getElementById('addTopic').addEventListener('click', addNewTopic);
     }
+
+    if (lodToggle) {
+        lodToggle.addEventListener('click', () => setLevelOfDetail(!levelOfDetail));
+    }
 }); 
\ No newline at end of file
@@ -0,0 +1,194 @@
+import math
+import multiprocessing
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+import numpy as np
+from config import TTS_PROCESSES, TTS_THREADS_PER_PROCESS
+
+SAMPLE_RATE = 24000
+
+# Crossfade between independently synthesized segments to avoid clicks at the joins
+CROSSFADE_MS = 15
+
+# Segments shorter than this cost more in per-call overhead than they gain in parallelism
+MIN_SEGMENT_CHARS = 80
+MAX_SEGMENT_CHARS = 400
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?…])\s+|(?<=[.!?…]["\')\]])\s+|\n\s*\n')
+
+# Per-process Kokoro pipeline, created by _init_worker
+_pipeline = None
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def split_sentences(text: str, max_chars: int = MAX_SEGMENT_CHARS) -> list:
+    """
+    Splits text at sentence boundaries and groups neighbouring sentences into segments.
+
+    Args:
+        text (str): The text to synthesize
+        max_chars (int): Sentences are grouped until a segment would exceed this length;
+            a single longer sentence becomes its own segment
+
+    Returns:
+        list: The segments, in order
+    """
+    sentences = [s.strip() for s in SENTENCE_BOUNDARY.split(text) if s and s.strip()]
+    segments = []
+    current = ''
+    for sentence in sentences:
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            segments.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        segments.append(current)
+    return segments
+
+def segment_length(text_length: int, processes: int) -> int:
+    """Picks a segment size that gives every process some work without making segments tiny."""
+    target = math.ceil(text_length / max(processes, 1))
+    return min(MAX_SEGMENT_CHARS, max(MIN_SEGMENT_CHARS, target))
+
+def crossfade_concat(segments: list, sample_rate: int = SAMPLE_RATE, fade_ms: int = CROSSFADE_MS):
+    """
+    Joins audio segments in order, overlapping each join with a short linear crossfade.
+
+    Returns:
+        np.ndarray: The joined audio, or None if there was nothing to join
+    """
+    segments = [np.asarray(s, dtype=np.float32) for s in segments if s is not None and len(s)]
+    if not segments:
+        return None
+
+    fade = int(sample_rate * fade_ms / 1000)
+    pieces = []
+    tail = segments[0]
+    for segment in segments[1:]:
+        n = min(fade, len(tail), len(segment))
+        if n:
+            ramp = np.linspace(0.0, 1.0, n, dtype=np.float32)
+            pieces.append(tail[:-n])
+            pieces.append(tail[-n:] * (1.0 - ramp) + segment[:n] * ramp)
+            tail = segment[n:]
+        else:
+            pieces.append(tail)
+            tail = segment
+    pieces.append(tail)
+    return np.concatenate(pieces)
+
+def _init_worker(threads=None):
+    global _pipeline
+    import torch
+    from kokoro import KPipeline
+    if threads:
+        # torch's default of one intra-op thread per core oversubscribes the host when several
+        # processes synthesize at once, and short segments barely benefit from more threads
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    _pipeline = KPipeline(lang_code='a')
+
+def synthesize_segment(text: str, voice: str):
+    chunks = [np.asarray(audio, dtype=np.float32)
+              for _, _, audio in _pipeline(text, voice=voice) if audio is not None]
+    if not chunks:
+        return None
+    return np.concatenate(chunks)
+
+def create_executor(processes: int, threads: int) -> ProcessPoolExecutor:
+    """
+    Starts a pool of synthesis processes, each with its own Kokoro pipeline.
+
+    Processes are spawned rather than forked so they never inherit torch or gunicorn thread state.
+    """
+    return ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(threads,)
+    )
+
+def get_executor():
+    """Returns this worker's shared synthesis pool, starting it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = create_executor(TTS_PROCESSES, TTS_THREADS_PER_PROCESS)
+        return _executor
+
+def warm_up(voice: str = 'af_heart') -> threading.Thread:
+    """
+    Loads the Kokoro model in the background so the first TTS request does not pay for it.
+
+    Starts this worker's synthesis pool and has every process synthesize a short phrase, which
+    spawns the processes, imports torch and kokoro and loads the model and voice. With
+    TTS_PROCESSES set to 0 the pipeline is loaded in this process instead. Requests that arrive
+    before it finishes simply wait for the pool, as they would have anyway.
+    """
+    def run():
+        executor = None
+        try:
+            if TTS_PROCESSES == 0:
+                with _executor_lock:
+                    if _pipeline is None:
+                        _init_worker()
+                return
+            executor = get_executor()
+            list(executor.map(synthesize_segment, ["Warming up."] * TTS_PROCESSES, repeat(voice)))
+        except BrokenProcessPool as e:
+            _reset_executor(executor)
+            print(f"TTS warm-up failed: {e}")
+        except Exception as e:
+            print(f"TTS warm-up failed: {e}")
+
+    thread = threading.Thread(target=run, name='tts-warm-up', daemon=True)
+    thread.start()
+    return thread
+
+def _reset_executor(broken):
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def synthesize(text: str, voice: str, executor=None, processes: int = None):
+    """
+    Synthesizes text sentence by sentence, in parallel, and stitches the audio back together in order.
+
+    With TTS_PROCESSES set to 0 the segments are synthesized one after another in this process.
+
+    Args:
+        text (str): The text to speak
+        voice (str): Kokoro voice id
+        executor: Optional process pool to use instead of the shared one
+        processes (int): Number of processes in the pool, used to size segments
+
+    Returns:
+        np.ndarray: Mono float32 audio at SAMPLE_RATE, or None if nothing was generated
+    """
+    if executor is None and TTS_PROCESSES == 0:
+        with _executor_lock:
+            if _pipeline is None:
+                _init_worker()
+        segments = split_sentences(text)
+        return crossfade_concat(list(map(synthesize_segment, segments, repeat(voice))))
+
+    if executor is None:
+        executor = get_executor()
+        processes = TTS_PROCESSES
+    segments = split_sentences(text, segment_length(len(text), processes or 1))
+
+    try:
+        # map() yields results in submission order, whichever process finishes first
+        audio = list(executor.map(synthesize_segment, segments, repeat(voice)))
+    except BrokenProcessPool:
+        # A synthesis process died (e.g. out of memory); start a fresh pool for the next request
+        _reset_executor(executor)
+        raise
+    return crossfade_concat(audio)